@@ -3,19 +3,25 @@ from streamlit_option_menu import option_menu
 import pandas as pd
 import math
 
-import requests
-from bs4 import BeautifulSoup
 from io import BytesIO
 from PIL import Image
 from datetime import datetime
-import lxml
 
 from email.message import EmailMessage
 import ssl
 import smtplib
 
+from app_cache import refresh_data
+
+# Reloads the engine if cleaned_data changed, before the imports below bind its tables
+refresh_data()
+
 from app_functions import calculate_total_emission_individual, convert_units, baseline_cutoff, evaluate_recipe, find_eligible_category, find_closest_alternative, compare_to_vehicle, calculate_num_trees
+from app_cache import get_category_options, get_ingredient_options, get_unit_options, get_nutrient_table, \
+    get_image_prefetcher
 from email_sender import email_sender, email_password
+from ingredient_search import search_ingredients
+from instrumentation import configure_logging, start_trace, finish_trace
 
 st.set_page_config(
     page_title="Alternative Recipe",
@@ -23,10 +29,8 @@ st.set_page_config(
     layout="wide"
 )
 
-df = pd.read_csv("cleaned_data/ingredients2.csv")
-nutrient_df = pd.read_csv("cleaned_data/nutrient_df.csv")
-unit_df = pd.read_csv("cleaned_data/unit_conversion.csv")
-footprints_df = pd.read_csv("cleaned_data/carbon_footprints.csv")
+configure_logging()
+start_trace("alternative_recipe_app")
 
 st.markdown("<h1 style='text-align: center;'>Alternative Recipe</h1>", unsafe_allow_html=True)
 
@@ -48,14 +52,8 @@ if "eval_button" not in st.session_state:
     st.session_state["eval_button"] = False
 
 def google_search_image(query):
-    url = 'https://www.google.com/search?q={0}&tbm=isch'.format(query)
-    content = requests.get(url).content
-    soup = BeautifulSoup(content, 'lxml' )
-    images = soup.findAll('img')
-    all_image_list = []
-    for image in images:
-        all_image_list.append(image.get('src'))
-    return all_image_list[1]
+    return get_image_prefetcher().get(query)
+
 
 placeholder = st.empty()
 
@@ -63,25 +61,32 @@ with st.expander("➕ Click to Add Ingredient"):
     ingredient_columns = st.columns([2,3,1,1])
     with ingredient_columns[0]:
         st.session_state["is_expanded"] = True
-        selected_category = st.selectbox("Category:", df["FoodGroupName"].unique(), key="input_col1")
+        selected_category = st.selectbox("Category:", get_category_options(), key="input_col1")
     with ingredient_columns[1]:
-        df_ingredient = df[df["FoodGroupName"] == st.session_state.input_col1]
-        selected_ingredient = st.selectbox("Ingredient:", df_ingredient["FoodDescription"].unique(), key="input_col2")
+        ingredient_query = st.text_input("Search Ingredient:", key="ingredient_query",
+                                         placeholder="Type part of a name, typos are fine")
+        ingredient_options = get_ingredient_options()[st.session_state.input_col1]
+        if ingredient_query:
+            search_results = search_ingredients(ingredient_query, st.session_state.input_col1, limit=20)
+            if search_results:
+                ingredient_options = [result.description for result in search_results]
+            else:
+                st.caption("No matching ingredient in this category.")
+        selected_ingredient = st.selectbox("Ingredient:", ingredient_options, key="input_col2")
     with ingredient_columns[2]:
         selected_amount = st.number_input("Amount: ", key="input_col3", step=0.1, min_value=0.0)
         if type(selected_amount) == str:
             st.error("Please enter a numeric value.")
     with ingredient_columns[3]:
-        selected_unit = st.selectbox("Unit:", unit_df["from_unit"].unique(), key="input_col4")
+        selected_unit = st.selectbox("Unit:", get_unit_options(), key="input_col4")
 
     nutrition_tab, metrics_tab = st.tabs(["Nutritional Information", "Summary Metrics"])
     with nutrition_tab:
         st.subheader(f"{selected_ingredient}")
-        nutrient_df_selected = nutrient_df[nutrient_df["FoodDescription"] == selected_ingredient].iloc[:, 3:15]
-        st.image(google_search_image(selected_ingredient), width=200)
-        columns = ["Alcohol", "Caffeine", "Calcium", "Carbohydrate", "Cholesterol", "Copper", "Fats",
-                   "Fatty Acids (Polysaturated)", "Fatty Acids (Unsaturated)", "Fibre", "Iron", "Lactose"]
-        nutrient_df_selected.columns = columns
+        nutrient_df_selected = get_nutrient_table(selected_ingredient)
+        image_url = google_search_image(selected_ingredient)
+        if image_url:
+            st.image(image_url, width=200)
         st.write(f"Nutrition Information for 100g of {selected_ingredient}, retrieved from [Statistics Canada](https://www.canada.ca/en/health-canada/services/food-nutrition/healthy-eating/nutrient-data/canadian-nutrient-file-2015-download-files.html).")
         st.table(nutrient_df_selected)
 
@@ -105,3 +110,5 @@ with st.expander("➕ Click to Add Ingredient"):
     if submit:
         st.session_state.df.loc[len(st.session_state.df)] = [selected_category, selected_ingredient, selected_amount,
                                                              selected_unit, (total_emission / 1000)]
+
+finish_trace()
@@ -0,0 +1,233 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+# Importing app_functions loads every table and index once; forked workers share them copy-on-write
+from app_functions import df, footprints_df, calculate_total_emission_individual, find_eligible_category, \
+    find_alternative_ranking, score_recipes, lookup_value
+from ingredient_search import search_ingredients, get_ingredient_index
+from instrumentation import log_event
+from precomputed_alternatives import load_alternatives
+
+max_alternatives = 100
+
+# Memory-mapped by serve() before forking, so the workers share its pages; None ranks every request live
+alternatives_artifact = None
+
+
+class BadRequest(Exception):
+    pass
+
+
+class NotFound(Exception):
+    pass
+
+
+def get_param(query, name, default=None, cast=str):
+    values = query.get(name)
+    if not values:
+        if default is None:
+            raise BadRequest(f"Missing query parameter '{name}'")
+        return default
+    try:
+        return cast(values[0])
+    except ValueError:
+        raise BadRequest(f"Invalid value for '{name}': {values[0]!r}")
+
+
+def require_ingredient(ingredient):
+    if lookup_value(df, ingredient, "CO2 Emission per Kg") is None:
+        raise NotFound(f"Unknown ingredient '{ingredient}'")
+    return ingredient
+
+
+def handle_emission(query, body):
+    ingredient = require_ingredient(get_param(query, "ingredient"))
+    amount = get_param(query, "amount", cast=float)
+    unit = get_param(query, "unit", default="g")
+    try:
+        emission = calculate_total_emission_individual(ingredient, amount, unit) / 1000
+    except ValueError as error:
+        raise BadRequest(str(error))
+    return {"ingredient": ingredient, "amount": amount, "unit": unit, "co2_kg": float(emission)}
+
+
+def require_list(value, name, keys):
+    # value must be a list of JSON objects that each have every one of keys
+    if not isinstance(value, list):
+        raise BadRequest(f"'{name}' must be a list")
+    for item in value:
+        if not isinstance(item, dict):
+            raise BadRequest(f"Every entry of '{name}' must be an object")
+        for key in keys:
+            if key not in item:
+                raise BadRequest(f"Every entry of '{name}' needs '{key}'")
+    return value
+
+
+def handle_recipe(query, body):
+    # {"ingredients": [{"ingredient": ..., "amount": ..., "unit": ...}, ...]} for one recipe, or
+    # {"recipes": [{"recipe_id": ..., "ingredients": [...]}, ...]} for several
+    if "recipes" in body:
+        rows = [dict(row, recipe_id=recipe["recipe_id"])
+                for recipe in require_list(body["recipes"], "recipes", ("recipe_id", "ingredients"))
+                for row in require_list(recipe["ingredients"], "ingredients", ("ingredient", "amount"))]
+    elif "ingredients" in body:
+        rows = [dict(row, recipe_id=0) for row in require_list(body["ingredients"], "ingredients",
+                                                                ("ingredient", "amount"))]
+    else:
+        raise BadRequest("Expected 'ingredients' or 'recipes' in the request body")
+    if not rows:
+        raise BadRequest("The recipe has no ingredients")
+
+    recipes = pd.DataFrame(rows)
+    if "unit" not in recipes:
+        recipes["unit"] = "g"
+    recipes["unit"] = recipes["unit"].fillna("g")
+    try:
+        scored = score_recipes(recipes)
+    except (ValueError, TypeError) as error:
+        raise BadRequest(str(error))
+
+    results = [{"recipe_id": row["recipe_id"], "co2_kg": float(row["CO2 Emission (Kg)"]), "label": row["Label"],
+                "missing_ingredients": int(row["Missing Ingredients"])} for row in scored.to_dict("records")]
+    if "recipes" in body:
+        return {"recipes": results}
+    return results[0]
+
+
+def handle_eligible_categories(query, body):
+    ingredient = require_ingredient(get_param(query, "ingredient"))
+    return {"ingredient": ingredient, "categories": find_eligible_category(df, footprints_df, ingredient)}
+
+
+def handle_alternatives(query, body):
+    ingredient = require_ingredient(get_param(query, "ingredient"))
+    category = get_param(query, "category")
+    k = min(get_param(query, "k", default=10, cast=int), max_alternatives)
+    offset = max(get_param(query, "offset", default=0, cast=int), 0)
+    ranking = None
+    if alternatives_artifact is not None:
+        ranking = alternatives_artifact.ranking(ingredient, category, offset, offset + k)
+    if ranking is None:
+        ranking = find_alternative_ranking(df, category, ingredient, offset + k)[offset:offset + k]
+    return {"ingredient": ingredient, "category": category, "alternatives": [asdict(match) for match in ranking]}
+
+
+def handle_search(query, body):
+    category = query["category"][0] if query.get("category") else None
+    limit = min(get_param(query, "limit", default=10, cast=int), max_alternatives)
+    return {"results": [asdict(result) for result in search_ingredients(get_param(query, "q"), category, limit)]}
+
+
+routes = {("GET", "/health"): lambda query, body: {"status": "ok", "pid": os.getpid()},
+          ("GET", "/emission"): handle_emission,
+          ("POST", "/recipe"): handle_recipe,
+          ("GET", "/eligible-categories"): handle_eligible_categories,
+          ("GET", "/alternatives"): handle_alternatives,
+          ("GET", "/search"): handle_search}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, keep-alive clients stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        handler = routes.get((method, url.path))
+        try:
+            if handler is None:
+                raise NotFound(f"No route for {method} {url.path}")
+            body = self.read_body() if method == "POST" else {}
+            self.send_json(200, handler(parse_qs(url.query), body))
+        except BadRequest as error:
+            self.send_json(400, {"error": str(error)})
+        except NotFound as error:
+            self.send_json(404, {"error": str(error)})
+        except Exception as error:
+            # Anything else is a bug; the client still gets a reply instead of a dropped connection
+            log_event(logging.ERROR, "api.error", method=method, path=url.path, error=repr(error))
+            self.send_json(500, {"error": "Internal server error"})
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise BadRequest("The request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise BadRequest("The request body must be a JSON object")
+        return body
+
+    def send_json(self, status, payload):
+        content = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ApiServer(ThreadingHTTPServer):
+    # Set before bind, so a restart can take the port over while old connections sit in TIME_WAIT
+    allow_reuse_address = True
+
+
+def serve(host="127.0.0.1", port=8000, workers=1):
+    global alternatives_artifact
+    # Built before forking so the workers share them
+    get_ingredient_index()
+    alternatives_artifact = load_alternatives()
+    # Pre-fork: the parent binds once and every worker accepts on the same socket
+    server = ApiServer((host, port), ApiHandler)
+    print(f"Serving on http://{host}:{server.server_address[1]} with {workers} worker(s)")
+
+    children = []
+    if workers > 1 and hasattr(os, "fork"):
+        for _ in range(workers - 1):
+            pid = os.fork()
+            if pid == 0:
+                children = []
+                break
+            children.append(pid)
+    if children:
+        # Stopping the parent stops the workers too
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless JSON API over the SustainaChoice engine.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
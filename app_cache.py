@@ -0,0 +1,128 @@
+import importlib
+import sys
+import threading
+
+import streamlit as st
+
+import app_functions
+import data_loader
+import precomputed_alternatives
+from email_queue import EmailQueue
+from email_sender import email_sender, email_password
+from image_prefetcher import ImagePrefetcher, create_http_session, create_pooled_image_cache
+
+nutrient_display_columns = ["Alcohol", "Caffeine", "Calcium", "Carbohydrate", "Cholesterol", "Copper", "Fats",
+                            "Fatty Acids (Polysaturated)", "Fatty Acids (Unsaturated)", "Fibre", "Iron", "Lactose"]
+
+# Modules that bind app_functions' tables at import, reloaded after it in this order
+engine_modules = ["app_functions", "ingredient_search", "recipe_model", "recipe_optimizer",
+                  "precomputed_alternatives"]
+
+
+def get_data_version():
+    # Hash of every cleaned_data file; data_loader remembers it per file size and mtime, so this is a few stats
+    return data_loader.tables_hash(list(data_loader.table_files))
+
+
+loaded_data_version = get_data_version()
+reload_lock = threading.RLock()
+
+
+# Everything below is computed once per server process and shared by every session and rerun, until
+# cleaned_data changes and refresh_data() reloads the engine.
+
+@st.cache_resource
+def get_datasets():
+    return {"ingredients": app_functions.df, "nutrients": app_functions.nutrient_df, "units": app_functions.unit_df,
+            "footprints": app_functions.footprints_df}
+
+
+@st.cache_resource
+def get_ingredient_options():
+    # Category -> its ingredients in table order, i.e. df[df["FoodGroupName"] == category]["FoodDescription"].unique()
+    ingredients = get_datasets()["ingredients"]
+    grouped = ingredients.groupby("FoodGroupName", sort=False)["FoodDescription"].unique()
+    return {category: descriptions.tolist() for category, descriptions in grouped.items()}
+
+
+@st.cache_data
+def get_category_options():
+    return get_datasets()["ingredients"]["FoodGroupName"].unique().tolist()
+
+
+@st.cache_data
+def get_unit_options():
+    return get_datasets()["units"]["from_unit"].unique().tolist()
+
+
+@st.cache_data
+def get_nutrient_table(ingredient):
+    nutrients = get_datasets()["nutrients"]
+    nutrient_table = nutrients[nutrients["FoodDescription"] == ingredient].iloc[:, 3:15].copy()
+    nutrient_table.columns = nutrient_display_columns
+    return nutrient_table
+
+
+@st.cache_resource
+def get_pareto_alternatives(ingredient):
+    # Cross-category frontier, worked out on the first request for an ingredient and then shared by every session
+    datasets = get_datasets()
+    return tuple(app_functions.find_pareto_alternatives(datasets["ingredients"], datasets["footprints"], ingredient))
+
+
+@st.cache_resource
+def get_alternatives_artifact():
+    # Memory-mapped top-k rankings for every ingredient; built here only if `python precomputed_alternatives.py`
+    # hasn't been run for the current cleaned_data
+    return precomputed_alternatives.load_alternatives()
+
+
+@st.cache_resource
+def get_http_session():
+    return create_http_session()
+
+
+@st.cache_resource
+def get_image_cache():
+    return create_pooled_image_cache(get_http_session())
+
+
+@st.cache_resource
+def get_image_prefetcher():
+    return ImagePrefetcher(get_image_cache())
+
+
+@st.cache_resource
+def get_email_queue():
+    return EmailQueue(email_sender, email_password)
+
+
+# Built from cleaned_data; the HTTP session, image cache, prefetcher and email queue are not
+data_caches = [get_datasets, get_ingredient_options, get_category_options, get_unit_options, get_nutrient_table,
+               get_pareto_alternatives, get_alternatives_artifact]
+
+
+def reload_data():
+    # Reads cleaned_data again: the table and array caches are dropped, app_functions and the modules holding
+    # its tables are re-executed, then every cache derived from the old data is cleared. Sessions mid-run keep
+    # the objects they already hold.
+    global loaded_data_version
+    with reload_lock:
+        # Taken first, so files replaced during the reload are picked up by the next refresh
+        version = get_data_version()
+        data_loader.clear_tables()
+        for name in engine_modules:
+            if name in sys.modules:
+                importlib.reload(sys.modules[name])
+        for cache in data_caches:
+            cache.clear()
+        loaded_data_version = version
+
+
+def refresh_data():
+    # Called at the top of every app run, before the app binds any engine names
+    if get_data_version() != loaded_data_version:
+        with reload_lock:
+            # Another session may have reloaded while this one waited
+            if get_data_version() != loaded_data_version:
+                reload_data()
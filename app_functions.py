@@ -1,35 +1,160 @@
+import logging
+import weakref
+from bisect import bisect_left
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import partial
+from types import MappingProxyType
+
 import pandas as pd
 import numpy as np
 
-df = pd.read_csv("cleaned_data/ingredients2.csv")
-nutrient_df = pd.read_csv("cleaned_data/nutrient_df.csv")
-unit_df = pd.read_csv("cleaned_data/unit_conversion.csv")
-footprints_df = pd.read_csv("cleaned_data/carbon_footprints.csv")
+from data_loader import load_arrays, load_table
+from food_categories import map_category, category_mapper
+from instrumentation import log_event, timed
+
+df = load_table("ingredients")
+nutrient_df = load_table("nutrients")
+unit_df = load_table("units")
+footprints_df = load_table("footprints")
 
 baseline_cutoff = ((((31368 * 1000000000) + (12577 * 1000000000)) / (15.3 * 1000000)) / 365 / 3) / 1000
 vehicle_base = 650 / 1000
 tree_cutoff = 68.5 / 1000
 
-def convert_units(amount, from_unit) -> float:
-    factor = unit_df[unit_df["from_unit"] == from_unit]["conversion_factor"].values[0]
+def normalize_name(name):
+    return str(name).lower().strip()
+
+def build_name_index(table):
+    # Normalized FoodDescription -> position of its first row in the table
+    name_index = {}
+    for position, name in enumerate(table["FoodDescription"].tolist()):
+        name_index.setdefault(normalize_name(name), position)
+    return MappingProxyType(name_index)
+
+class SortedNameIndex(Mapping):
+    # The same mapping as build_name_index, held as sorted names plus positions so it can be memory-mapped and
+    # shared between processes; a lookup is a binary search instead of a dict hit
+
+    def __init__(self, names, positions):
+        self.names = names
+        self.positions = positions
+
+    def __getitem__(self, name):
+        slot = int(np.searchsorted(self.names, name))
+        if slot < len(self.names) and self.names[slot] == name:
+            return int(self.positions[slot])
+        raise KeyError(name)
+
+    def __iter__(self):
+        return iter(self.names.tolist())
+
+    def __len__(self):
+        return len(self.names)
+
+    def items(self):
+        # Without a binary search per name
+        return zip(self.names.tolist(), self.positions.tolist())
+
+    def values(self):
+        return self.positions.tolist()
+
+def build_name_arrays():
+    # Name indexes of the two tables looked up by name, for load_arrays
+    arrays = {}
+    for prefix, table in (("ingredients", df), ("nutrients", nutrient_df)):
+        name_index = build_name_index(table)
+        names = sorted(name_index)
+        arrays[f"{prefix}_names"] = np.array(names, dtype=str)
+        arrays[f"{prefix}_positions"] = np.array([name_index[name] for name in names], dtype=np.int64)
+    return arrays
+
+table_caches = {}
+
+def get_table_cache(table, builder):
+    # builder(table), built once per table object and dropped together with it
+    cache_key = (id(table), builder)
+    table_ref, cached = table_caches.get(cache_key, (None, None))
+    if table_ref is None or table_ref() is not table:
+        cached = set_table_cache(table, builder, builder(table))
+    return cached
+
+def set_table_cache(table, builder, cached):
+    # Hand get_table_cache a value built elsewhere, e.g. one mapped from a file other processes share
+    cache_key = (id(table), builder)
+    table_caches[cache_key] = (weakref.ref(table, lambda _: table_caches.pop(cache_key, None)), cached)
+    return cached
+
+def get_name_index(table):
+    return get_table_cache(table, build_name_index)
+
+# Published once per version of the data and mapped read-only by every worker process
+name_arrays = load_arrays("name-index", ["ingredients", "nutrients"], build_name_arrays)
+set_table_cache(df, build_name_index, SortedNameIndex(name_arrays["ingredients_names"],
+                                                      name_arrays["ingredients_positions"]))
+set_table_cache(nutrient_df, build_name_index, SortedNameIndex(name_arrays["nutrients_names"],
+                                                               name_arrays["nutrients_positions"]))
+
+def build_id_index(table):
+    # FoodID -> position of its first row in the table
+    food_ids = table["FoodID"].to_numpy()
+    unique_ids, positions = np.unique(food_ids, return_index=True)
+    return MappingProxyType(dict(zip(unique_ids.tolist(), positions.tolist())))
+
+def find_position(table, food):
+    # A food is either its FoodDescription or its integer FoodID (as resolved by ingredient_search)
+    if isinstance(food, (int, np.integer)) and not isinstance(food, bool):
+        return get_table_cache(table, build_id_index).get(int(food))
+    return get_name_index(table).get(normalize_name(food))
+
+def lookup_value(table, food, column):
+    position = find_position(table, food)
+    if position is None:
+        return None
+    return table[column].values[position]
+
+def lookup_nutrients(food):
+    position = find_position(nutrient_df, food)
+    if position is None:
+        return None
+    return nutrient_values[position]
+
+unit_index = pd.Index(unit_df["from_unit"])
+unit_factor_values = unit_df["conversion_factor"].to_numpy(dtype=np.float64)
+# The same factors as a dict, for the one-unit calls every ingredient row makes
+unit_factors = dict(zip(unit_index.tolist(), unit_factor_values.tolist()))
+
+def convert_units(amount, from_unit):
+    # amount and from_unit can each be a scalar or a column (list, array or Series) of the same length
+    if isinstance(from_unit, str) or np.ndim(from_unit) == 0:
+        factor = unit_factors.get(from_unit)
+        if factor is None:
+            raise ValueError(f"Unknown unit(s) {[from_unit]}, expected one of {unit_index.tolist()}")
+    else:
+        positions = unit_index.get_indexer(from_unit)
+        if (positions < 0).any():
+            unknown_units = sorted(set(np.asarray(from_unit, dtype=object).ravel()[positions < 0]))
+            raise ValueError(f"Unknown unit(s) {unknown_units}, expected one of {unit_index.tolist()}")
+        factor = unit_factor_values[positions]
+
+    if not isinstance(amount, (int, float)) and np.ndim(amount) > 0 and not isinstance(amount, pd.Series):
+        amount = np.asarray(amount, dtype=np.float64)
     return amount * factor
 
+@timed("lookup.emission")
 def calculate_total_emission_individual(food_description, food_amount, food_unit):
     total_amount = convert_units(food_amount, food_unit)
 
-    match = df[df["FoodDescription"].str.lower().str.strip() == food_description.lower().strip()]
-    if match.empty:
-        print(f"[⚠️ ERROR] Emission data not found for '{food_description}'")
+    food_emission = lookup_value(df, food_description, "CO2 Emission per Kg")
+    if food_emission is None:
+        log_event(logging.WARNING, "emission.not_found", food=food_description)
         return 0.0
 
-    food_emission = match["CO2 Emission per Kg"].values[0]
-    print(food_emission)
-
     if pd.isna(food_emission):
-        print(f"[⚠️ ERROR] Emission value is NaN for '{food_description}'")
+        log_event(logging.WARNING, "emission.nan", food=food_description)
         return 0.0
 
-    print(f"[DEBUG] Emission for '{food_description}': {food_emission} kg/kg")
+    log_event(logging.DEBUG, "emission.found", food=food_description, kg_per_kg=food_emission)
 
     return total_amount * food_emission
 
@@ -46,125 +171,269 @@ def evaluate_recipe(df):
     label = create_ghg_label(total_emission_recipe, baseline_cutoff)
     return total_emission_recipe, label
 
-map_category = {"Dairy and Egg Products": "Dairy Products",
-                "Spices and Herbs": "Species",
-                "Fats and Oils": "Oils",
-                "Poultry Products": "Poultry Meat",
-                "Soups, Sauces and Gravies": "Sauces",
-                "Sausages and Luncheon meats": "Pig Meat",
-                "Breakfast cereals": "Cereals",
-                "Fruits and fruit juices": "Fruits",
-                "Pork Products": "Pig Meat",
-                "Vegetables and Vegetable Products": "Other Vegetables",
-                "Nuts and Seeds": "Nuts",
-                "Beef Products": "Beef (dairy herd)",
-                "Finfish and Shellfish Products": "Fish (farmed)",
-                "Legumes and Legume Products": "Legumes",
-                "Lamb, Veal and Game": "Lamb & Mutton",
-                "Baked Products": "Wheat & Rye",
-                "Sweets": "Sweets",
-                "Beverages": "Beverages",
-                "Cereals, Grains and Pasta": "Cereals"}
-
-def category_mapper(category, emission_df, map_category):
-    mapped_category = map_category[category]
-    emission_factor = emission_df.loc[emission_df["Entity"] == mapped_category]["GHG emissions per kilogram"].values[0]
-    return emission_factor
+def create_ghg_labels(totals, baseline):
+    # Vectorized create_ghg_label; NaN totals get no label, same as the scalar version
+    totals = np.asarray(totals, dtype=np.float64)
+    return np.select([totals > baseline, totals > (baseline * 0.5), totals <= (baseline * 0.5)],
+                     ["High Impact", "Medium Impact", "Low Impact"], default=None)
+
+def build_emission_factors(table):
+    # CO2 Emission per Kg for every normalized FoodDescription, NaN factors counted as 0 like the scalar path
+    name_index = get_name_index(table)
+    factors = table["CO2 Emission per Kg"].to_numpy(dtype=np.float64)[list(name_index.values())]
+    return pd.Series(np.nan_to_num(factors), index=list(name_index.keys()))
+
+emission_factors = build_emission_factors(df)
+
+def calculate_recipe_emissions(recipes, ingredient_column="ingredient", amount_column="amount", unit_column="unit"):
+    # CO2 Emission in Kg for every (ingredient, amount, unit) row; unknown ingredients come back as NaN
+    grams = convert_units(recipes[amount_column].astype(np.float64), recipes[unit_column])
+    factors = recipes[ingredient_column].astype(str).str.lower().str.strip().map(emission_factors)
+    return grams * factors / 1000
+
+def score_recipes(recipes, recipe_column="recipe_id", ingredient_column="ingredient", amount_column="amount",
+                  unit_column="unit"):
+    # One row per recipe with its total CO2 Emission in Kg, impact label and number of unknown ingredients.
+    # Without a recipe_column the whole frame is scored as a single recipe.
+    emissions = calculate_recipe_emissions(recipes, ingredient_column, amount_column, unit_column)
+    if recipe_column in recipes:
+        recipe_ids = recipes[recipe_column]
+    else:
+        recipe_ids = pd.Series(0, index=recipes.index)
+    return summarize_recipe_emissions(recipe_ids, emissions)
+
+def summarize_recipe_emissions(recipe_ids, emissions):
+    # Per-row emissions from calculate_recipe_emissions -> one scored row per recipe, in first-seen order
+    grouped = pd.DataFrame({"recipe_id": recipe_ids.to_numpy(),
+                            "CO2 Emission (Kg)": emissions.fillna(0.0).to_numpy(),
+                            "Missing Ingredients": emissions.isna().to_numpy()}).groupby("recipe_id", sort=False).sum()
+    scored = grouped.reset_index()
+    scored["Missing Ingredients"] = scored["Missing Ingredients"].astype(int)
+    scored["Label"] = create_ghg_labels(scored["CO2 Emission (Kg)"], baseline_cutoff)
+    return scored
 
+nutrient_columns = ["ALCOHOL", "CAFFEINE", "CALCIUM", "CARBOHYDRATE, TOTAL (BY DIFFERENCE)", "CHOLESTEROL",
+                    "FAT (TOTAL LIPIDS)", "FATTY ACIDS, POLYUNSATURATED, TOTAL", "FATTY ACIDS, SATURATED, TOTAL",
+                    "IRON", "LACTOSE"]
+
+def build_food_emissions(nutrient_df, ingredients):
+    # CO2 Emission per Kg for every nutrient row, joined on the integer FoodID (NaN when the food has none)
+    food_emissions = ingredients.drop_duplicates("FoodID").set_index("FoodID")["CO2 Emission per Kg"]
+    positions = food_emissions.index.get_indexer(nutrient_df["FoodID"])
+    emissions = food_emissions.to_numpy(dtype=np.float64)[positions]
+    emissions[positions < 0] = np.nan
+    return emissions
+
+def build_nutrient_matrices(nutrient_df, ingredients):
+    # Per food group: descriptions, a contiguous (foods x nutrients) float64 matrix and the foods' emissions,
+    # rows kept in table order
+    food_emissions = build_food_emissions(nutrient_df, ingredients)
+    nutrient_matrices = {}
+    for category, positions in nutrient_df.groupby("FoodGroupName", sort=False, observed=True).indices.items():
+        descriptions = nutrient_df["FoodDescription"].to_numpy(dtype=object)[positions]
+        matrix = np.ascontiguousarray(nutrient_df[nutrient_columns].to_numpy(dtype=np.float64)[positions])
+        emissions = food_emissions[positions]
+        # Shared by every session and thread, so nothing may write to it
+        for values in (descriptions, matrix, emissions):
+            values.setflags(write=False)
+        nutrient_matrices[category] = (descriptions, matrix, emissions)
+    return MappingProxyType(nutrient_matrices)
+
+def build_nutrient_arrays():
+    # build_nutrient_matrices flattened for load_arrays: every group's rows back to back, group g being rows
+    # group_offsets[g]:group_offsets[g + 1], plus nutrient_values in table order
+    nutrient_matrices = build_nutrient_matrices(nutrient_df, df)
+    groups = list(nutrient_matrices.values())
+    return {"group_names": np.array(list(nutrient_matrices), dtype=str),
+            "group_offsets": np.cumsum([0] + [len(descriptions) for descriptions, _, _ in groups]),
+            "group_descriptions": np.concatenate([descriptions for descriptions, _, _ in groups]).astype(str),
+            "group_matrix": np.concatenate([matrix for _, matrix, _ in groups]),
+            "group_emissions": np.concatenate([emissions for _, _, emissions in groups]),
+            "nutrient_values": nutrient_df[nutrient_columns].to_numpy(dtype=np.float64)}
+
+def nutrient_matrices_from_arrays(arrays):
+    # The same mapping as build_nutrient_matrices, every entry a view into the shared arrays
+    offsets = arrays["group_offsets"].tolist()
+    return MappingProxyType({category: (arrays["group_descriptions"][start:stop], arrays["group_matrix"][start:stop],
+                                        arrays["group_emissions"][start:stop])
+                             for category, start, stop in zip(arrays["group_names"].tolist(), offsets, offsets[1:])})
+
+nutrient_arrays = load_arrays("nutrient-matrix", ["ingredients", "nutrients"], build_nutrient_arrays, version=2)
+nutrient_matrices = nutrient_matrices_from_arrays(nutrient_arrays)
+nutrient_values = nutrient_arrays["nutrient_values"]
+
+def compute_nutrient_errors(matrix, query):
+    squared_errors = np.subtract(matrix, query, dtype=np.float64) ** 2
+    # Add the columns up in order so every sum matches the old per-row loop exactly
+    error_values = squared_errors[:, 0].copy()
+    for column in range(1, squared_errors.shape[1]):
+        error_values += squared_errors[:, column]
+    return error_values
+
+def rank_top_k(matrix, query, k):
+    # Rows of the k closest foods in matrix, closest first, and their distances
+    error_values = compute_nutrient_errors(matrix, query)
+
+    if k < len(error_values):
+        candidates = np.sort(np.argpartition(error_values, k - 1)[:k])
+    else:
+        candidates = np.arange(len(error_values))
+    # Stable sort on table-ordered candidates so ties always page in the same order
+    ranking = candidates[np.argsort(error_values[candidates], kind="stable")]
+    return ranking, error_values[ranking]
+
+def query_top_k(nutrient_matrices, category, query, k):
+    # Brute force over one food group is cheaper than a tree at 10 dimensions and <1000 rows per group
+    if category not in nutrient_matrices or k <= 0:
+        return [], np.empty(0), np.empty(0)
+    descriptions, matrix, emissions = nutrient_matrices[category]
+    ranking, error_values = rank_top_k(matrix, query, k)
+    return descriptions[ranking].tolist(), error_values, emissions[ranking]
+
+@dataclass(frozen=True)
+class AlternativeMatch:
+    food: str
+    alternative: str
+    category: str
+    rank: int
+    error_value: float
+    emission: float
+    original_emission: float
+
+@timed("search.ranking")
+def find_alternative_ranking(df, category, food, k):
+    query = lookup_nutrients(food)
+    original_food_emission = lookup_value(df, food, "CO2 Emission per Kg")
+    if query is None or original_food_emission is None:
+        return []
+
+    alternatives, error_values, alternative_emissions = query_top_k(nutrient_matrices, category, query, k)
+
+    ranking = []
+    for alternative, error_value, alternative_emission in zip(alternatives, error_values, alternative_emissions):
+        if alternative_emission < original_food_emission:
+            ranking.append(AlternativeMatch(food, alternative, category, len(ranking), float(error_value),
+                                            float(alternative_emission), float(original_food_emission)))
+    return ranking
+
+def build_category_emissions(footprints_df):
+    # Food groups sorted by the emission of their mapped footprint entity (lowest row if an entity repeats)
+    entity_emissions = footprints_df.groupby("Entity")["GHG emissions per kilogram"].min()
+    category_order = {category: position for position, category in enumerate(map_category)}
+    pairs = sorted((entity_emissions[entity], category_order[category], category)
+                   for category, entity in map_category.items() if entity in entity_emissions.index)
+    emissions = [emission for emission, _, _ in pairs]
+    categories = [(position, category) for _, position, category in pairs]
+    return emissions, categories
+
+def categories_cheaper_than(category_emissions, emission_value):
+    emissions, categories = category_emissions
+    cheaper = categories[:bisect_left(emissions, emission_value)]
+    # Keep map_category order, as the old list comprehension did
+    return [category for _, category in sorted(cheaper)]
+
+@timed("lookup.eligible_category")
 def find_eligible_category(df, footprints_df, food):
-    try:
-        food_emission_value = df[df["FoodDescription"] == food]["CO2 Emission per Kg"].values[0]
-        footprints_list = footprints_df[footprints_df["GHG emissions per kilogram"] == food_emission_value]
-        filtered_footprints_list = footprints_df[footprints_df["GHG emissions per kilogram"] < food_emission_value][
-            "Entity"].tolist()
-        all_value_list = map_category.values()
-        filtered_list = [category for category in filtered_footprints_list if category in all_value_list]
-        filtered_list_keys = [k for k, v in map_category.items() if v in filtered_list]
-    except:
-        pass
-    return filtered_list_keys
+    # Food groups whose footprint is lower than the food's; an unknown food has none
+    food_emission_value = lookup_value(df, food, "CO2 Emission per Kg")
+    if food_emission_value is None or pd.isna(food_emission_value):
+        return []
+    return categories_cheaper_than(get_table_cache(footprints_df, build_category_emissions), food_emission_value)
 
 def calculate_num_trees(total_emission):
     tree_num = total_emission / tree_cutoff
     return tree_num
 
+@timed("search.closest_alternative")
 def find_closest_alternative(df, footprints_df, category, food, within_category_attempt):
-    filtered_list = find_eligible_category(df, footprints_df, food)
+    # Only reads the shared tables and indexes, so concurrent sessions can call it on the same objects.
+    # Returns an AlternativeMatch, or None when there is no lower-emission alternative at that rank.
 
-    food_row = nutrient_df[nutrient_df["FoodDescription"] == food]
-    if food_row.empty:
-        print(f"Food '{food}' not found in the nutrient data.")
+    # Extract nutrient values from the row
+    query = lookup_nutrients(food)
+    if query is None:
+        log_event(logging.WARNING, "alternative.food_not_found", food=food)
         return None
 
-    # Extract nutrient values from the row
-    alcohol = food_row["ALCOHOL"].values[0]
-    caffeine = food_row["CAFFEINE"].values[0]
-    calcium = food_row["CALCIUM"].values[0]
-    carbohydrate = food_row["CARBOHYDRATE, TOTAL (BY DIFFERENCE)"].values[0]
-    cholesterol = food_row["CHOLESTEROL"].values[0]
-    lipid = food_row["FAT (TOTAL LIPIDS)"].values[0]
-    poly_acid = food_row["FATTY ACIDS, POLYUNSATURATED, TOTAL"].values[0]
-    saturated_acid = food_row["FATTY ACIDS, SATURATED, TOTAL"].values[0]
-    iron = food_row["IRON"].values[0]
-    lactose = food_row["LACTOSE"].values[0]
-
-    # Make sure the 'Error Value' column is initialized before use
-    nutrient_df["Error Value"] = 0.0
-
-    def compute_ols(alcohol, caffeine, calcium, carbohydrate, cholesterol, lipid, poly_acid, saturated_acid, iron,
-                    lactose, nutrient_df):
-        # Always work with a copy to avoid SettingWithCopyWarning
-        nutrient_df = nutrient_df[nutrient_df["FoodGroupName"] == category].copy()
-
-        for ind, row in nutrient_df.iterrows():
-            alcohol_error = (row["ALCOHOL"] - alcohol) ** 2
-            caffeine_error = (row["CAFFEINE"] - caffeine) ** 2
-            calcium_error = (row["CALCIUM"] - calcium) ** 2
-            carbohydate_error = (row["CARBOHYDRATE, TOTAL (BY DIFFERENCE)"] - carbohydrate) ** 2
-            cholesterol_error = (row["CHOLESTEROL"] - cholesterol) ** 2
-            lipid_error = (row["FAT (TOTAL LIPIDS)"] - lipid) ** 2
-            poly_acid_error = (row["FATTY ACIDS, POLYUNSATURATED, TOTAL"] - poly_acid) ** 2
-            saturated_acid_error = (row["FATTY ACIDS, SATURATED, TOTAL"] - saturated_acid) ** 2
-            iron_error = (row["IRON"] - iron) ** 2
-            lactose_error = (row["LACTOSE"] - lactose) ** 2
-
-            all_error = (
-                    alcohol_error + caffeine_error + calcium_error + carbohydate_error +
-                    cholesterol_error + lipid_error + poly_acid_error +
-                    saturated_acid_error + iron_error + lactose_error
-            )
-
-            # Safely set the 'Error Value' on the copy
-            nutrient_df.at[ind, "Error Value"] = all_error
-
-        # Sort the DataFrame by 'Error Value' to find the best match
-        min_error_df = nutrient_df.sort_values(by=["Error Value"], ascending=True)
+    def compute_ols(query, nutrient_matrices):
+        try:
+            descriptions, matrix, emissions = nutrient_matrices[category]
+        except KeyError:
+            log_event(logging.DEBUG, "alternative.none", food=food, category=category,
+                      attempt=within_category_attempt)
+            return None
+
+        error_values = compute_nutrient_errors(matrix, query)
+
+        # Same quicksort pandas uses in sort_values, so ties rank exactly as before
+        ranking = np.argsort(error_values, kind="quicksort")
 
         try:
-            best_alternative = min_error_df.iloc[within_category_attempt]["FoodDescription"]
-            best_alternative_emission = df[df["FoodDescription"] == best_alternative]["CO2 Emission per Kg"].values[0]
-            original_food_emission = df[df["FoodDescription"] == food]["CO2 Emission per Kg"].values[0]
+            best_alternative = str(descriptions[ranking[within_category_attempt]])
+            best_error_value = error_values[ranking[within_category_attempt]]
+            best_alternative_emission = emissions[ranking[within_category_attempt]]
+            original_food_emission = lookup_value(df, food, "CO2 Emission per Kg")
+            if original_food_emission is None:
+                raise IndexError(food)
 
             # Check if the alternative can replace the original
             if best_alternative_emission < original_food_emission:
-                print(f"Alternative: {best_alternative} can replace {food} with a lower emission!")
-
-                # Update the original DataFrame with the alternative
-                df.loc[df["FoodDescription"] == food, "FoodDescription"] = best_alternative
-                df.loc[df["FoodDescription"] == best_alternative, "CO2 Emission per Kg"] = best_alternative_emission
-
-                # You can also update any other columns in the DataFrame (e.g., Amount, Category) if needed
-                # df.loc[df["FoodDescription"] == best_alternative, "Amount:"] = some_new_value
-                return best_alternative
+                log_event(logging.DEBUG, "alternative.found", food=food, alternative=best_alternative)
+                return AlternativeMatch(food, best_alternative, category, within_category_attempt,
+                                        float(best_error_value), float(best_alternative_emission),
+                                        float(original_food_emission))
             else:
-                print(f"Alternative: {best_alternative} cannot replace {food} with a lower emission.")
+                log_event(logging.DEBUG, "alternative.not_lower", food=food, alternative=best_alternative)
                 return None
         except IndexError:
-            print("No returning value!")
+            log_event(logging.DEBUG, "alternative.none", food=food, category=category,
+                      attempt=within_category_attempt)
             return None
 
-    return compute_ols(alcohol, caffeine, calcium, carbohydrate, cholesterol, lipid, poly_acid, saturated_acid,
-                       iron, lactose, nutrient_df)
+    return compute_ols(query, nutrient_matrices)
+
+def pareto_frontier(distances, emissions):
+    # Positions of the candidates that no other candidate beats on both nutrient distance and CO2 per kg,
+    # closest first (so emissions fall along the frontier)
+    order = np.lexsort((emissions, distances))
+    ordered_emissions = emissions[order]
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = ordered_emissions[1:] < np.minimum.accumulate(ordered_emissions)[:-1]
+    return order[keep]
+
+def search_category(query, category):
+    descriptions, matrix, emissions = nutrient_matrices[category]
+    return descriptions, compute_nutrient_errors(matrix, query), emissions
+
+@timed("search.pareto")
+def find_pareto_alternatives(df, footprints_df, food, executor=None):
+    # Lower-emission swaps from every eligible category at once, as a Pareto frontier of AlternativeMatch.
+    # Pass a concurrent.futures executor to search the categories in parallel.
+    query = lookup_nutrients(food)
+    original_food_emission = lookup_value(df, food, "CO2 Emission per Kg")
+    if query is None or original_food_emission is None or pd.isna(original_food_emission):
+        return []
+
+    categories = [category for category in find_eligible_category(df, footprints_df, food)
+                  if category in nutrient_matrices]
+    if not categories:
+        return []
+    if executor is None:
+        results = [search_category(query, category) for category in categories]
+    else:
+        results = list(executor.map(partial(search_category, query), categories))
+
+    descriptions = np.concatenate([result[0] for result in results])
+    error_values = np.concatenate([result[1] for result in results])
+    emissions = np.concatenate([result[2] for result in results])
+    candidate_categories = np.repeat(np.array(categories, dtype=object), [len(result[0]) for result in results])
+
+    # NaN emissions fail the comparison and drop out with the rest
+    candidates = np.flatnonzero(emissions < original_food_emission)
+    frontier = candidates[pareto_frontier(error_values[candidates], emissions[candidates])]
+    return [AlternativeMatch(food, str(descriptions[position]), candidate_categories[position], rank,
+                             float(error_values[position]), float(emissions[position]), float(original_food_emission))
+            for rank, position in enumerate(frontier)]
 
 def compare_to_vehicle(kg):
     total_mile_travelled = kg / vehicle_base
@@ -0,0 +1,165 @@
+# Score a recipe dump offline, one output row per recipe.
+#
+#   python batch_score.py recipes.csv scores.csv --workers 4
+#   python batch_score.py recipes.jsonl scores.jsonl --alternatives
+#
+# Input rows are (recipe_id, ingredient, amount, unit), as CSV with a header or as JSON lines. Rows of one
+# recipe must be contiguous. The input is read --chunksize rows at a time and at most 2 * --workers chunks
+# are in flight, so memory stays flat however large the file is.
+import argparse
+import functools
+import multiprocessing
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Loaded once in the parent; forked pool workers share the tables and indexes copy-on-write
+from app_functions import df, footprints_df, calculate_recipe_emissions, summarize_recipe_emissions, \
+    compare_to_vehicle, calculate_num_trees, find_eligible_category, find_alternative_ranking, unit_index
+
+input_columns = ["recipe_id", "ingredient", "amount", "unit"]
+
+
+def detect_format(path, format=None):
+    if format is not None:
+        return format
+    return "jsonl" if path.endswith((".jsonl", ".json")) else "csv"
+
+
+def read_chunks(path, format, chunksize):
+    if format == "csv":
+        return pd.read_csv(path, chunksize=chunksize, usecols=input_columns,
+                           dtype={"recipe_id": str, "ingredient": str, "unit": str})
+    return pd.read_json(path, lines=True, chunksize=chunksize)
+
+
+def split_recipes(chunks, recipe_column="recipe_id"):
+    # Hold back the chunk's last recipe, which may continue in the next chunk
+    tail = None
+    for chunk in chunks:
+        if tail is not None:
+            chunk = pd.concat([tail, chunk], ignore_index=True)
+        recipe_ids = chunk[recipe_column].to_numpy()
+        other_rows = np.flatnonzero(recipe_ids != recipe_ids[-1])
+        tail_start = other_rows[-1] + 1 if len(other_rows) else 0
+        tail = chunk.iloc[tail_start:]
+        if tail_start:
+            yield chunk.iloc[:tail_start]
+    if tail is not None and len(tail):
+        yield tail
+
+
+@functools.lru_cache(maxsize=None)
+def best_alternative(food):
+    # Closest nutrient match across every lower-emission category, or None
+    best = None
+    for category in find_eligible_category(df, footprints_df, food):
+        ranking = find_alternative_ranking(df, category, food, 1)
+        if ranking and (best is None or ranking[0].error_value < best.error_value):
+            best = ranking[0]
+    return best
+
+
+def score_chunk(chunk, alternatives=False):
+    # Rows with an unknown unit can't be converted, so they count as missing like unknown ingredients
+    chunk = chunk.copy()
+    unknown_unit = ~chunk["unit"].isin(unit_index)
+    chunk.loc[unknown_unit, "unit"] = "g"
+    chunk["amount"] = pd.to_numeric(chunk["amount"], errors="coerce")
+    emissions = calculate_recipe_emissions(chunk)
+    emissions[unknown_unit.to_numpy()] = np.nan
+
+    scored = summarize_recipe_emissions(chunk["recipe_id"], emissions)
+    scored = scored.rename(columns={"CO2 Emission (Kg)": "co2_kg", "Missing Ingredients": "missing_ingredients",
+                                    "Label": "label"})
+    scored["vehicle_miles"] = compare_to_vehicle(scored["co2_kg"])
+    scored["trees"] = calculate_num_trees(scored["co2_kg"])
+    if not alternatives:
+        return scored
+
+    # Suggest a swap for each recipe's largest emitter
+    top_rows = pd.DataFrame({"recipe_id": chunk["recipe_id"].to_numpy(), "ingredient": chunk["ingredient"].to_numpy(),
+                             "co2": emissions.fillna(-1.0).to_numpy()})
+    top_rows = top_rows.sort_values("co2", kind="mergesort", ascending=False).drop_duplicates("recipe_id")
+    top_rows = top_rows.set_index("recipe_id").reindex(scored["recipe_id"])
+
+    suggestions = []
+    for food, co2 in zip(top_rows["ingredient"].tolist(), top_rows["co2"].tolist()):
+        match = best_alternative(food) if co2 > 0 else None
+        if match is None:
+            suggestions.append((food if co2 > 0 else None, None, None, 0.0))
+        else:
+            saving = co2 * (1 - match.emission / match.original_emission)
+            suggestions.append((food, match.alternative, match.category, saving))
+    scored[["top_ingredient", "alternative", "alternative_category", "co2_saving_kg"]] = pd.DataFrame(
+        suggestions, index=scored.index)
+    return scored
+
+
+class ResultWriter:
+    def __init__(self, path, format):
+        self.output = open(path, "w", newline="")
+        self.format = format
+        self.header = True
+
+    def write(self, scored):
+        if self.format == "csv":
+            self.output.write(scored.to_csv(index=False, header=self.header))
+        else:
+            text = scored.to_json(orient="records", lines=True)
+            self.output.write(text if text.endswith("\n") else text + "\n")
+        self.header = False
+
+    def close(self):
+        self.output.close()
+
+
+def run(input_path, output_path, input_format=None, output_format=None, chunksize=100000, workers=1,
+        alternatives=False):
+    chunks = split_recipes(read_chunks(input_path, detect_format(input_path, input_format), chunksize))
+    writer = ResultWriter(output_path, detect_format(output_path, output_format))
+    num_recipes = 0
+    try:
+        if workers <= 1:
+            for chunk in chunks:
+                scored = score_chunk(chunk, alternatives)
+                writer.write(scored)
+                num_recipes += len(scored)
+            return num_recipes
+
+        with multiprocessing.Pool(workers) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(score_chunk, (chunk, alternatives)))
+                if len(pending) >= 2 * workers:
+                    scored = pending.popleft().get()
+                    writer.write(scored)
+                    num_recipes += len(scored)
+            while pending:
+                scored = pending.popleft().get()
+                writer.write(scored)
+                num_recipes += len(scored)
+        return num_recipes
+    finally:
+        writer.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score (recipe_id, ingredient, amount, unit) rows per recipe.")
+    parser.add_argument("input", help="CSV with a header, or JSON lines (.jsonl)")
+    parser.add_argument("output", help="CSV, or JSON lines (.jsonl)")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--output-format", choices=["csv", "jsonl"])
+    parser.add_argument("--chunksize", type=int, default=100000, help="input rows per chunk")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--alternatives", action="store_true",
+                        help="suggest a lower-emission swap for each recipe's largest emitter")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    num_recipes = run(args.input, args.output, args.input_format, args.output_format, args.chunksize, args.workers,
+                      args.alternatives)
+    print(f"Scored {num_recipes} recipes in {time.perf_counter() - started:.1f} s", file=sys.stderr)
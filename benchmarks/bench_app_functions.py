@@ -0,0 +1,184 @@
+# Latency and peak-memory benchmarks for the app_functions hot paths.
+#
+#   python benchmarks/bench_app_functions.py --label my-branch
+#   python benchmarks/bench_app_functions.py --label my-branch --compare benchmarks/results/main.json
+#
+# Every function runs against the real cleaned_data tables and against synthetic food tables of
+# --sizes foods. Results are written to benchmarks/results/<label>.json so two runs can be compared; that
+# directory is git-ignored, since timings only mean something on the machine that took them.
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_functions  # noqa: E402
+
+results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def make_synthetic_tables(num_foods, seed=0):
+    rng = np.random.default_rng(seed)
+    categories = np.array(list(app_functions.map_category))
+    food_groups = categories[rng.integers(0, len(categories), num_foods)]
+    descriptions = np.array([f"Synthetic food {position}" for position in range(num_foods)], dtype=object)
+
+    nutrients = pd.DataFrame({"FoodID": np.arange(num_foods), "FoodGroupName": food_groups,
+                              "FoodDescription": descriptions})
+    for column in app_functions.nutrient_columns:
+        nutrients[column] = rng.gamma(1.0, 5.0, num_foods)
+
+    category_emissions = {category: app_functions.category_mapper(category, app_functions.footprints_df,
+                                                                  app_functions.map_category)
+                          for category in categories}
+    ingredients = pd.DataFrame({"FoodID": np.arange(num_foods), "FoodDescription": descriptions,
+                                "FoodGroupName": food_groups,
+                                "CO2 Emission per Kg": pd.Series(food_groups).map(category_emissions).to_numpy()})
+    return ingredients, nutrients
+
+
+@contextlib.contextmanager
+def use_tables(ingredients, nutrients):
+    # Point the module-level tables and the indexes derived from them at another dataset for one benchmark
+    names = ["df", "nutrient_df", "nutrient_matrices", "nutrient_values", "emission_factors"]
+    saved = {name: getattr(app_functions, name) for name in names}
+    app_functions.df = ingredients
+    app_functions.nutrient_df = nutrients
+    app_functions.nutrient_matrices = app_functions.build_nutrient_matrices(nutrients, ingredients)
+    app_functions.nutrient_values = nutrients[app_functions.nutrient_columns].to_numpy(dtype=np.float64)
+    app_functions.emission_factors = app_functions.build_emission_factors(ingredients)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(app_functions, name, value)
+
+
+def make_recipe(ingredients, num_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = rng.integers(0, len(ingredients), num_rows)
+    return pd.DataFrame({"ingredient": ingredients["FoodDescription"].to_numpy()[positions],
+                         "amount": rng.random(num_rows) * 500,
+                         "unit": rng.choice(app_functions.unit_index.to_numpy(), num_rows)})
+
+
+def make_cases(ingredients, nutrients):
+    foods = nutrients["FoodDescription"].to_numpy()
+    rng = np.random.default_rng(1)
+    probe = foods[rng.integers(0, len(foods))]
+    target_category = app_functions.find_eligible_category(ingredients, app_functions.footprints_df, probe)
+    target_category = target_category[0] if target_category else nutrients["FoodGroupName"].iloc[0]
+    recipe = make_recipe(ingredients, 20)
+    recipe_frame = pd.DataFrame({"CO2 Emission (Kg):": rng.random(20)})
+    amounts = rng.random(len(ingredients)) * 500
+    units = rng.choice(app_functions.unit_index.to_numpy(), len(ingredients))
+
+    return {
+        "find_closest_alternative": lambda: app_functions.find_closest_alternative(
+            ingredients, app_functions.footprints_df, target_category, probe, 0),
+        "find_alternative_ranking": lambda: app_functions.find_alternative_ranking(
+            ingredients, target_category, probe, 10),
+        "calculate_total_emission_individual": lambda: app_functions.calculate_total_emission_individual(
+            probe, 250.0, "g"),
+        "find_eligible_category": lambda: app_functions.find_eligible_category(
+            ingredients, app_functions.footprints_df, probe),
+        "convert_units": lambda: app_functions.convert_units(125.0, "cup"),
+        "convert_units[column]": lambda: app_functions.convert_units(amounts, units),
+        "evaluate_recipe": lambda: app_functions.evaluate_recipe(recipe_frame),
+        "score_recipes": lambda: app_functions.score_recipes(recipe),
+    }
+
+
+def measure(function, repeats, warmup=3):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            function()
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    timings.sort()
+    return {"median_ms": statistics.median(timings),
+            "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            "min_ms": timings[0],
+            "repeats": repeats,
+            "peak_kb": peak / 1024}
+
+
+def run_dataset(dataset, ingredients, nutrients, repeats, only):
+    results = []
+    with use_tables(ingredients, nutrients):
+        for name, function in make_cases(ingredients, nutrients).items():
+            if only and name not in only:
+                continue
+            result = measure(function, repeats)
+            result.update({"function": name, "dataset": dataset, "foods": len(nutrients)})
+            results.append(result)
+            print(f"{dataset:>18} {name:<38} median {result['median_ms']:9.3f} ms   "
+                  f"p95 {result['p95_ms']:9.3f} ms   peak {result['peak_kb']:10.1f} KiB")
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as baseline_file:
+        baseline = {(entry["dataset"], entry["function"]): entry for entry in json.load(baseline_file)["results"]}
+    print(f"\nCompared with {baseline_path} (ratio = this run / baseline, median latency)")
+    regressions = 0
+    for entry in results:
+        previous = baseline.get((entry["dataset"], entry["function"]))
+        if previous is None:
+            continue
+        ratio = entry["median_ms"] / previous["median_ms"] if previous["median_ms"] else float("inf")
+        flag = "  REGRESSION" if ratio > threshold else ""
+        regressions += bool(flag)
+        print(f"{entry['dataset']:>18} {entry['function']:<38} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app_functions hot paths.")
+    parser.add_argument("--label", default="latest", help="name of the results file to write")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10_000, 100_000, 1_000_000],
+                        help="synthetic table sizes, in foods")
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--only", nargs="*", help="benchmark only these functions")
+    parser.add_argument("--compare", help="results file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="ratio above which a change is a regression")
+    args = parser.parse_args()
+
+    results = run_dataset("real", app_functions.df, app_functions.nutrient_df, args.repeats, args.only)
+    for size in args.sizes:
+        ingredients, nutrients = make_synthetic_tables(size)
+        results += run_dataset(f"synthetic-{size}", ingredients, nutrients, args.repeats, args.only)
+
+    os.makedirs(results_dir, exist_ok=True)
+    output_path = os.path.join(results_dir, f"{args.label}.json")
+    with open(output_path, "w") as output:
+        json.dump({"label": args.label, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+                   "results": results}, output, indent=2)
+    print(f"\nWrote {output_path}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
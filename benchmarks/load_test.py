@@ -0,0 +1,122 @@
+# Load test for api_server.py: requests per second and latency percentiles per endpoint.
+#
+#   python api_server.py --workers 4 &
+#   python benchmarks/load_test.py --url http://127.0.0.1:8000 --duration 10 --processes 4 --threads 8
+#
+# Every client thread keeps one HTTP/1.1 connection open and cycles through a mix of the API's endpoints
+# for real ingredients. Client processes keep the load generator itself from being bound by one GIL.
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import quote, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import load_table  # noqa: E402
+from instrumentation import percentile  # noqa: E402
+
+endpoints = ["emission", "recipe", "eligible-categories", "alternatives"]
+
+
+def sample_ingredients(count, seed):
+    ingredients = load_table("ingredients")[["FoodDescription", "FoodGroupName"]].dropna()
+    return ingredients.sample(min(count, len(ingredients)), random_state=seed).values.tolist()
+
+
+def build_request(endpoint, rng, ingredients):
+    food, category = rng.choice(ingredients)
+    if endpoint == "emission":
+        return "GET", f"/emission?ingredient={quote(food)}&amount={rng.randint(10, 500)}&unit=g", None
+    if endpoint == "eligible-categories":
+        return "GET", f"/eligible-categories?ingredient={quote(food)}", None
+    if endpoint == "alternatives":
+        return "GET", f"/alternatives?ingredient={quote(food)}&category={quote(category)}&k=10", None
+    rows = [{"ingredient": name, "amount": rng.randint(10, 500), "unit": "g"}
+            for name, _ in rng.sample(ingredients, rng.randint(3, 10))]
+    return "POST", "/recipe", json.dumps({"ingredients": rows})
+
+
+def run_client(host, port, deadline, ingredients, seed, results):
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    latencies = {endpoint: [] for endpoint in endpoints}
+    errors = 0
+    while time.time() < deadline:
+        endpoint = rng.choice(endpoints)
+        method, path, body = build_request(endpoint, rng, ingredients)
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        if response.status != 200:
+            errors += 1
+            continue
+        latencies[endpoint].append((time.perf_counter() - start) * 1000)
+    connection.close()
+    results.append((latencies, errors))
+
+
+def run_process(host, port, deadline, ingredients, threads, seed):
+    results = []
+    clients = [threading.Thread(target=run_client, args=(host, port, deadline, ingredients, seed * 1000 + number,
+                                                         results))
+               for number in range(threads)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure requests per second against api_server.py.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8, help="client threads per process")
+    parser.add_argument("--ingredients", type=int, default=500, help="how many ingredients to sample from")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    ingredients = sample_ingredients(args.ingredients, args.seed)
+    started = time.time()
+    deadline = started + args.duration
+    jobs = [(url.hostname, url.port or 80, deadline, ingredients, args.threads, args.seed + number)
+            for number in range(args.processes)]
+    with multiprocessing.Pool(args.processes) as pool:
+        process_results = pool.starmap(run_process, jobs)
+    elapsed = time.time() - started
+
+    latencies = {endpoint: [] for endpoint in endpoints}
+    errors = 0
+    for results in process_results:
+        for client_latencies, client_errors in results:
+            errors += client_errors
+            for endpoint, values in client_latencies.items():
+                latencies[endpoint].extend(values)
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{total} requests in {elapsed:.1f} s with {args.processes * args.threads} connections: "
+          f"{total / elapsed:.0f} req/s, {errors} errors")
+    for endpoint, values in latencies.items():
+        if values:
+            print(f"  {endpoint:<22} n={len(values):<7} {len(values) / elapsed:7.0f} req/s  "
+                  f"p50={percentile(values, 0.5):8.2f} ms  p99={percentile(values, 0.99):8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
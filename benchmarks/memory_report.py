@@ -0,0 +1,49 @@
+# Memory footprint of the loaded tables before and after data_loader's compaction.
+#
+#   python benchmarks/memory_report.py
+#
+# "before" parses each CSV the way data_loader used to (every column, float64/int64, plain strings);
+# "after" is what load_table hands to app_functions now. Sizes are pandas' deep memory usage.
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_loader  # noqa: E402
+from app_functions import nutrient_columns  # noqa: E402
+
+
+def table_bytes(table):
+    return int(table.memory_usage(deep=True).sum())
+
+
+def format_bytes(size):
+    return f"{size / 1024 / 1024:8.2f} MB"
+
+
+def main():
+    rows = []
+    for name, file_name in data_loader.table_files.items():
+        dtypes = dict(data_loader.table_dtypes[name], **{column: np.float64
+                                                        for column in data_loader.dropped_columns.get(name, [])})
+        before = pd.read_csv(os.path.join(data_loader.data_dir, file_name), dtype=dtypes)
+        after = data_loader.load_table(name)
+        rows.append((name, table_bytes(before), table_bytes(after)))
+        if name == "nutrients":
+            rows.append(("nutrient matrix", before[nutrient_columns].to_numpy(dtype=np.float64).nbytes,
+                         after[nutrient_columns].to_numpy(dtype=np.float64).nbytes))
+
+    print(f"{'table':<18} {'before':>11} {'after':>11}  saved")
+    for name, before, after in rows:
+        print(f"{name:<18} {format_bytes(before)} {format_bytes(after)}  {1 - after / before:6.1%}")
+    total_before = sum(before for _, before, _ in rows)
+    total_after = sum(after for _, _, after in rows)
+    print(f"{'total':<18} {format_bytes(total_before)} {format_bytes(total_after)}  "
+          f"{1 - total_after / total_before:6.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# Resident memory of several engine worker processes running side by side (Linux only, reads /proc).
+#
+#   python benchmarks/worker_memory.py [--workers 4]
+#
+# Each worker is a fresh interpreter that imports app_functions and runs a few lookups and searches, like a
+# Streamlit or api_server process would. "private" is memory only that worker holds; "cache maps" is the part of
+# its RSS that is data_loader's memory-mapped cache files, which the page cache holds once for every worker.
+import argparse
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def read_smaps(cache_dir):
+    totals = {"Rss": 0, "Pss": 0, "Private": 0, "Cache": 0}
+    in_cache = False
+    with open("/proc/self/smaps") as smaps:
+        for line in smaps:
+            if not line[0].isupper():
+                # A mapping header: "start-end perms offset dev inode [path]"; field lines start with a name
+                in_cache = line.split()[-1].startswith(cache_dir)
+                continue
+            field, _, value = line.partition(":")
+            if not value.strip().endswith("kB"):
+                continue
+            size = int(value.split()[0]) * 1024
+            if field in ("Rss", "Pss"):
+                totals[field] += size
+                if field == "Rss" and in_cache:
+                    totals["Cache"] += size
+            elif field in ("Private_Clean", "Private_Dirty"):
+                totals["Private"] += size
+    return totals
+
+
+def worker(results, done):
+    import app_functions
+    from data_loader import cache_dir
+
+    foods = app_functions.nutrient_df["FoodDescription"].astype(str).tolist()[::50]
+    for food in foods:
+        app_functions.calculate_total_emission_individual(food, 100, "g")
+        for category in app_functions.find_eligible_category(app_functions.df, app_functions.footprints_df, food):
+            app_functions.find_closest_alternative(app_functions.df, app_functions.footprints_df, category, food, 0)
+    results.put(read_smaps(cache_dir))
+    # Stay alive until every worker has measured, so PSS splits the shared pages between all of them
+    done.wait()
+
+
+def format_bytes(size):
+    return f"{size / 1024 / 1024:8.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident memory of engine workers running side by side.")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    # Warm the caches first so every worker maps them instead of building its own
+    import app_functions  # noqa: F401
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    done = context.Event()
+    processes = [context.Process(target=worker, args=(results, done)) for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in processes]
+    done.set()
+    for process in processes:
+        process.join()
+
+    print(f"{'worker':<8} {'rss':>11} {'pss':>11} {'private':>11} {'cache maps':>11}")
+    for number, totals in enumerate(measurements):
+        print(f"{number:<8} {format_bytes(totals['Rss'])} {format_bytes(totals['Pss'])} "
+              f"{format_bytes(totals['Private'])} {format_bytes(totals['Cache'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
+import io
+
 import streamlit as st
-import matplotlib.pyplot as plt
-import numpy as np
+from matplotlib.figure import Figure
+
+from climate_projection import project_savings, sensitivity_scenarios, percentile_bands
 
 st.set_page_config(page_title="Climate Impact Analyzer", layout="centered")
 
@@ -14,33 +17,67 @@ current_emission = st.sidebar.number_input("❌ Current meal CO2 (kg)", min_valu
 new_emission = st.sidebar.number_input("✅ New meal CO2 (kg)", min_value=0.0, value=2.0, step=0.1)
 meals_per_week = st.sidebar.slider("🥗 Meals per week you're changing", 1, 21, 7)
 weeks_to_project = st.sidebar.slider("📅 Weeks to forecast", 4, 104, 52)
+households = st.sidebar.number_input("🏠 Households making the change", min_value=1, value=1, step=1)
+uncertainty = st.sidebar.slider("📊 Uncertainty in your numbers (± %)", 0, 50, 20)
+
+num_scenarios = 5000
+
 
-# Calculate CO2 savings
-emission_saved_per_meal = current_emission - new_emission
-weekly_savings = emission_saved_per_meal * meals_per_week
-weeks = np.arange(1, weeks_to_project + 1)
-total_savings = weekly_savings * weeks
+@st.cache_data(max_entries=256)
+def project_bands(current_emission, new_emission, meals_per_week, weeks_to_project, households, uncertainty):
+    # All scenarios in one broadcast; only the percentile bands are kept
+    current, new, meals = sensitivity_scenarios(current_emission, new_emission, meals_per_week,
+                                                uncertainty / 100, num_scenarios)
+    projection = project_savings(current, new, meals, weeks_to_project, households)
+    return projection.weeks, percentile_bands(projection.savings)
 
-# Equivalents
-trees_offset = total_savings / 21  # 1 tree absorbs ~21kg CO2 per year
-flights_offset = total_savings / 250  # 1 short-haul flight ~250kg CO2
+
+@st.cache_data(max_entries=256)
+def projection_chart(current_emission, new_emission, meals_per_week, weeks_to_project, households, uncertainty):
+    # Rendered once per set of inputs; dragging a slider back to a previous value reuses the PNG
+    weeks, bands = project_bands(current_emission, new_emission, meals_per_week, weeks_to_project, households,
+                                 uncertainty)
+    fig = Figure()
+    ax = fig.subplots()
+    if uncertainty:
+        ax.fill_between(weeks, bands[0], bands[4], color="green", alpha=0.15, label="90% of scenarios")
+        ax.fill_between(weeks, bands[1], bands[3], color="green", alpha=0.3, label="50% of scenarios")
+    ax.plot(weeks, bands[2], color="green", linewidth=2, label="Median")
+    ax.set_xlabel("Weeks")
+    ax.set_ylabel("Total CO2 Saved (kg)")
+    ax.set_title("CO2 Reduction Forecast")
+    ax.grid(True)
+    if uncertainty:
+        ax.legend(loc="upper left")
+    image = io.BytesIO()
+    fig.savefig(image, format="png")
+    return image.getvalue()
+
+
+# Point estimate for the summary, same arithmetic as the bands with no uncertainty
+projection = project_savings(current_emission, new_emission, meals_per_week, weeks_to_project, households)
+total_savings = projection.savings[0]
+trees_offset = projection.trees[0]
+flights_offset = projection.flights[0]
 
 # Chart
 st.markdown("### 📈 Projected CO2 Savings Over Time")
-fig, ax = plt.subplots()
-ax.plot(weeks, total_savings, color="green", linewidth=2)
-ax.set_xlabel("Weeks")
-ax.set_ylabel("Total CO2 Saved (kg)")
-ax.set_title("CO2 Reduction Forecast")
-ax.grid(True)
-st.pyplot(fig)
+st.image(projection_chart(current_emission, new_emission, meals_per_week, weeks_to_project, households,
+                          uncertainty))
 
 # Summary
 st.markdown("### 🌍 Your Potential Impact")
-st.success(f"By changing {meals_per_week} meals per week for {weeks_to_project} weeks:")
+if households > 1:
+    st.success(f"If {households:,} households change {meals_per_week} meals per week for {weeks_to_project} weeks:")
+else:
+    st.success(f"By changing {meals_per_week} meals per week for {weeks_to_project} weeks:")
 st.markdown(f"- You will save **{total_savings[-1]:,.1f} kg** of CO2")
 st.markdown(f"- That's like planting **{trees_offset[-1]:,.0f} trees** 🌳")
 st.markdown(f"- Or avoiding **{flights_offset[-1]:,.1f} short-haul flights** ✈️")
+if uncertainty:
+    _, bands = project_bands(current_emission, new_emission, meals_per_week, weeks_to_project, households,
+                             uncertainty)
+    st.markdown(f"- With ±{uncertainty}% uncertainty, 90% of scenarios save between "
+                f"**{bands[0, -1]:,.1f}** and **{bands[4, -1]:,.1f} kg**")
 
 st.caption("Estimates are approximations. Based on general CO2 equivalents.")
-
@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+tree_absorption_kg = 21  # 1 tree absorbs ~21kg CO2 per year
+flight_emission_kg = 250  # 1 short-haul flight ~250kg CO2
+default_percentiles = (5, 25, 50, 75, 95)
+
+
+@dataclass(frozen=True)
+class Projection:
+    # savings[scenario, week] is the cumulative CO2 saved (kg) by the end of weeks[week]
+    weeks: np.ndarray
+    savings: np.ndarray
+
+    @property
+    def trees(self):
+        return self.savings / tree_absorption_kg
+
+    @property
+    def flights(self):
+        return self.savings / flight_emission_kg
+
+
+def project_savings(current_emission, new_emission, meals_per_week, weeks_to_project, households=1):
+    # Every argument is a scalar or an array of scenarios; they broadcast against each other. A scenario stops
+    # saving after its own weeks_to_project, so scenarios with different horizons share one week axis.
+    current, new, meals, horizon, households = np.broadcast_arrays(
+        *[np.atleast_1d(np.asarray(value, dtype=np.float64))
+          for value in (current_emission, new_emission, meals_per_week, weeks_to_project, households)])
+    weeks = np.arange(1, int(horizon.max()) + 1)
+    weekly_savings = (current - new) * meals * households
+    savings = weekly_savings[:, None] * np.minimum(weeks[None, :], horizon[:, None])
+    return Projection(weeks, savings)
+
+
+def sensitivity_scenarios(current_emission, new_emission, meals_per_week, spread=0.2, num_scenarios=5000, seed=0):
+    # Scenarios around one household's answers: both meal footprints and the number of meals changed vary
+    # uniformly by +/- spread (as a fraction)
+    rng = np.random.default_rng(seed)
+    jitter = rng.uniform(1 - spread, 1 + spread, size=(3, num_scenarios))
+    return (current_emission * jitter[0], new_emission * jitter[1],
+            np.maximum(np.rint(meals_per_week * jitter[2]), 0))
+
+
+def percentile_bands(values, percentiles=default_percentiles):
+    # (len(percentiles), weeks) array, one row per percentile, taken across scenarios
+    return np.percentile(values, percentiles, axis=0)
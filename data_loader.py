@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cleaned_data")
+cache_dir = os.path.join(data_dir, ".cache")
+
+table_files = {"ingredients": "ingredients2.csv",
+               "nutrients": "nutrient_df.csv",
+               "units": "unit_conversion.csv",
+               "footprints": "carbon_footprints.csv"}
+
+table_dtypes = {"ingredients": {"FoodID": np.int64, "FoodGroupID": np.int64, "NutrientID": np.int64,
+                                "NutrientValue": np.float64, "CO2 Emission per Kg": np.float64},
+                "nutrients": {"FoodID": np.int64, "ALCOHOL": np.float64, "CAFFEINE": np.float64,
+                              "CALCIUM": np.float64, "CARBOHYDRATE, TOTAL (BY DIFFERENCE)": np.float64,
+                              "CHOLESTEROL": np.float64, "COPPER": np.float64, "FAT (TOTAL LIPIDS)": np.float64,
+                              "FATTY ACIDS, POLYUNSATURATED, TOTAL": np.float64,
+                              "FATTY ACIDS, SATURATED, TOTAL": np.float64, "FIBRE, TOTAL DIETARY": np.float64,
+                              "IRON": np.float64, "LACTOSE": np.float64},
+                "units": {"conversion_factor": np.float64},
+                "footprints": {"GHG emissions per kilogram": np.float64}}
+
+# Leftovers from the notebook that nothing reads; skipped while parsing
+dropped_columns = {"nutrients": ["Error Value"]}
+
+# Narrower dtypes applied after parsing. Repeated labels become categoricals. The long table's nutrient values
+# are float32; nutrient_df keeps float64, since alternatives are ranked on its values and float32 rounding can
+# swap two near-equal distances. Emission factors stay float64.
+compact_dtypes = {"ingredients": {"FoodID": np.int32, "FoodGroupID": np.int16, "NutrientID": np.int16,
+                                  "NutrientValue": np.float32, "FoodDescription": "category",
+                                  "FoodGroupName": "category", "NutrientName": "category",
+                                  "NutrientUnit": "category"},
+                  "nutrients": {"FoodID": np.int32, "FoodGroupName": "category"},
+                  "units": {},
+                  "footprints": {}}
+
+# Bump when the cache layout or compact_dtypes change so old caches are rebuilt
+cache_format = 3
+
+tables = {}
+file_hashes = {}
+array_sets = {}
+
+
+def file_hash(path):
+    # Remembered per (size, mtime) so every cache keyed on the same file hashes it once per process
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in file_hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as source:
+            for block in iter(lambda: source.read(1 << 20), b""):
+                digest.update(block)
+        file_hashes[key] = digest.hexdigest()[:16]
+    return file_hashes[key]
+
+
+def tables_hash(names):
+    # One hash over several source tables, for caches derived from all of them
+    digest = hashlib.sha256()
+    for name in names:
+        digest.update(file_hash(os.path.join(data_dir, table_files[name])).encode())
+    return digest.hexdigest()[:16]
+
+
+def table_cache_path(name, source_hash):
+    return os.path.join(cache_dir, f"{name}-{source_hash}-v{cache_format}")
+
+
+def intern_strings(values):
+    # One str object per distinct text, shared by every table that holds it
+    return np.array([sys.intern(value) if isinstance(value, str) else value for value in values], dtype=object)
+
+
+def compact_table(name, table):
+    table = table.astype({column: dtype for column, dtype in compact_dtypes[name].items() if column in table})
+    for column in table.columns:
+        values = table[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            table[column] = values.cat.rename_categories(intern_strings(values.cat.categories))
+        elif values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+            table[column] = intern_strings(values.to_numpy(dtype=object))
+    return table
+
+
+def write_table_cache(table, path):
+    # One .npy per column, strings as fixed-width unicode so nothing needs pickling.
+    # A categorical is stored as its integer codes plus a second file with the categories.
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(temp_path, exist_ok=True)
+    columns = []
+    for position, column in enumerate(table.columns):
+        entry = {"name": column, "file": f"{position}.npy", "kind": "numeric"}
+        if isinstance(table[column].dtype, pd.CategoricalDtype):
+            np.save(os.path.join(temp_path, entry["file"]), table[column].cat.codes.to_numpy())
+            entry["kind"] = "category"
+            entry["categories"] = f"{position}.categories.npy"
+            np.save(os.path.join(temp_path, entry["categories"]),
+                    table[column].cat.categories.to_numpy(dtype=object).astype(str))
+            columns.append(entry)
+            continue
+        values = table[column].to_numpy()
+        if values.dtype == object:
+            missing = pd.isna(values)
+            if missing.any():
+                np.save(os.path.join(temp_path, f"{position}.missing.npy"), missing)
+                entry["missing"] = f"{position}.missing.npy"
+            values = np.where(missing, "", values).astype(str)
+            entry["kind"] = "text"
+        np.save(os.path.join(temp_path, entry["file"]), values)
+        columns.append(entry)
+    with open(os.path.join(temp_path, "columns.json"), "w") as manifest:
+        json.dump(columns, manifest)
+    publish_cache(temp_path, path)
+
+
+def publish_cache(temp_path, path):
+    # Readers only ever see a complete directory
+    try:
+        os.replace(temp_path, path)
+    except OSError:
+        # Another process published the same cache first
+        shutil.rmtree(temp_path, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+
+
+def load_array(path):
+    # Read-only and backed by the page cache, so every process on the host maps the same copy. np.asarray drops
+    # the memmap subclass (slow to index element by element) without copying.
+    return np.asarray(np.load(path, mmap_mode="r"))
+
+
+def read_table_cache(path):
+    with open(os.path.join(path, "columns.json")) as manifest:
+        columns = json.load(manifest)
+    data = {}
+    for entry in columns:
+        if entry["kind"] == "text":
+            values = intern_strings(np.load(os.path.join(path, entry["file"])).tolist())
+            if "missing" in entry:
+                values[np.load(os.path.join(path, entry["missing"]))] = np.nan
+        elif entry["kind"] == "category":
+            categories = intern_strings(np.load(os.path.join(path, entry["categories"])).tolist())
+            values = pd.Categorical.from_codes(load_array(os.path.join(path, entry["file"])), categories)
+        else:
+            values = load_array(os.path.join(path, entry["file"]))
+        data[entry["name"]] = values
+    # copy=False keeps the mapped categorical codes (and, where pandas allows it, numeric columns) shared
+    return pd.DataFrame(data, columns=[entry["name"] for entry in columns], copy=False)
+
+
+def remove_stale_caches(name, keep_path):
+    if not os.path.isdir(cache_dir):
+        return
+    for entry in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, entry)
+        if entry.startswith(f"{name}-") and path != keep_path:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def read_source_table(name, compact=True):
+    dropped = dropped_columns.get(name, [])
+    table = pd.read_csv(os.path.join(data_dir, table_files[name]), dtype=table_dtypes[name],
+                        usecols=lambda column: column not in dropped)
+    return compact_table(name, table) if compact else table
+
+
+def read_table(name, use_cache=True):
+    if not use_cache:
+        return read_source_table(name)
+
+    path = table_cache_path(name, file_hash(os.path.join(data_dir, table_files[name])))
+    if os.path.isdir(path):
+        return read_table_cache(path)
+
+    table = read_source_table(name)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_table_cache(table, path)
+        remove_stale_caches(name, path)
+    except OSError:
+        # A read-only checkout still works, it just parses the CSV every start
+        pass
+    return table
+
+
+def load_table(name, use_cache=True):
+    # Each table is parsed at most once per process and shared by every module that asks for it
+    if name not in tables:
+        with span("data.load", table=name):
+            tables[name] = read_table(name, use_cache)
+    return tables[name]
+
+
+def write_array_cache(arrays, path):
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(temp_path, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(temp_path, f"{name}.npy"), values)
+    publish_cache(temp_path, path)
+
+
+def read_array_cache(path):
+    return {entry[:-len(".npy")]: load_array(os.path.join(path, entry))
+            for entry in sorted(os.listdir(path)) if entry.endswith(".npy")}
+
+
+def load_arrays(name, table_names, builder, version=1):
+    # builder() -> {array name: numeric or fixed-width text ndarray} derived from table_names. Built by the first
+    # process to need it for this version of the data, then memory-mapped read-only by every process, so
+    # workers on one host share one copy instead of each rebuilding their own. Bump version when builder changes.
+    if name not in array_sets:
+        path = os.path.join(cache_dir, f"{name}-{tables_hash(table_names)}-v{version}")
+        if os.path.isdir(path):
+            array_sets[name] = read_array_cache(path)
+        else:
+            with span("data.build_arrays", arrays=name):
+                arrays = builder()
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                write_array_cache(arrays, path)
+                remove_stale_caches(name, path)
+                arrays = read_array_cache(path)
+            except OSError:
+                # A read-only checkout keeps this process's own copy, read-only like the mapped one
+                for values in arrays.values():
+                    values.setflags(write=False)
+            array_sets[name] = arrays
+    return array_sets[name]
+
+
+def clear_tables():
+    tables.clear()
+    array_sets.clear()
@@ -0,0 +1,277 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+from data_loader import cache_dir, data_dir, table_files, file_hash, read_table_cache, remove_stale_caches, \
+    write_table_cache
+from food_categories import map_category, category_mapper
+from instrumentation import span
+
+# The steps of nutrition_data_cleaning.ipynb as stages. Raw files come from the Canadian Nutrient File
+# (https://www.canada.ca/en/health-canada/services/food-nutrition/healthy-eating/nutrient-data.html) and the
+# Poore & Nemecek food footprints, laid out the way the notebook read them:
+#
+#   data/cnf-fcen-csv/FOOD GROUP.csv, FOOD NAME.csv, NUTRIENT NAME.csv, NUTRIENT AMOUNT.csv
+#   data/food-footprints.csv
+#
+# Every stage's output is cached under cleaned_data/.cache, keyed by a hash of its raw files' contents, the
+# keys of the stages it reads and its version, so a run only redoes stages whose inputs changed.
+
+raw_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+footprint_column = "GHG emissions per kilogram (Poore & Nemecek, 2018)"
+
+# name -> (file under raw_dir, columns used, dtypes, encoding)
+raw_tables = {"food_groups": ("cnf-fcen-csv/FOOD GROUP.csv", ["FoodGroupID", "FoodGroupName"],
+                              {"FoodGroupID": np.int64}, "ISO-8859-1"),
+              "food_names": ("cnf-fcen-csv/FOOD NAME.csv", ["FoodID", "FoodDescription", "FoodGroupID"],
+                             {"FoodID": np.int64, "FoodGroupID": np.int64}, "ISO-8859-1"),
+              "nutrient_names": ("cnf-fcen-csv/NUTRIENT NAME.csv", ["NutrientID", "NutrientName", "NutrientUnit"],
+                                 {"NutrientID": np.int64}, "ISO-8859-1"),
+              "nutrient_amounts": ("cnf-fcen-csv/NUTRIENT AMOUNT.csv", ["FoodID", "NutrientID", "NutrientValue"],
+                                   {"FoodID": np.int64, "NutrientID": np.int64, "NutrientValue": np.float64},
+                                   "ISO-8859-1"),
+              "footprints": ("food-footprints.csv", ["Entity", footprint_column],
+                             {footprint_column: np.float64}, "utf-8")}
+
+# Entities the app maps food groups onto that the footprint data doesn't have, as averages of related ones
+added_footprints = [("Dairy Products", (3.15 + 4.67 + 0.98) / 3),
+                    ("Species", 9.3703),
+                    ("Oils", (3.0336 + 4.2483 + 3.0231 + 3.2401 + 5.6383) / 5),
+                    ("Sauces", 0),
+                    ("Cereals", 1.4785),
+                    ("Fruits", (0.43 + 0.86 + 0.39 + 1.05) / 4),
+                    ("Beef", (99.48 + 33.3) / 2),
+                    ("Fruits", (0.43 + 0.86 + 0.39 + 1.05) / 4),
+                    ("Beverages", 0),
+                    ("Legumes", 1.6042),
+                    ("Sweets", (1.5225 + 1.6414) / 2)]
+
+nutrition_labels = ["ALCOHOL", "CAFFEINE", "CALCIUM", "CARBOHYDRATE, TOTAL (BY DIFFERENCE)", "CHOLESTEROL", "COPPER",
+                    "FAT (TOTAL LIPIDS)", "FATTY ACIDS, POLYUNSATURATED, TOTAL", "FATTY ACIDS, SATURATED, TOTAL",
+                    "FIBRE, TOTAL DIETARY", "IRON", "LACTOSE"]
+
+# Grams per unit for nutrient amounts not already in g
+unit_conversion_mapper = {"mg": 0.001,
+                          "kCal": 0.129598,
+                          "µg": 0.000001}
+
+# Food groups that are dishes rather than ingredients
+excluded_categories = ["Babyfoods", "Fast Foods", "Mixed Dishes", "Snacks"]
+
+# Kitchen units the app accepts, in grams
+kitchen_units = [("g", 1.0), ("ounce", 28.0), ("Kg", 1000.0), ("pound", 453.592), ("mL", 1.0), ("tbsp", 21.25),
+                 ("cup", 128.0), ("tsp", 5.69), ("pint", 473.177), ("gallon", 3785.0), ("clove", 3628.73896)]
+
+default_chunksize = 250000
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    inputs: tuple  # "raw:<raw_tables name>" or the name of an earlier stage
+    build: object  # build(*inputs, chunksize=...) -> DataFrame; raw inputs arrive as file paths
+    output: str = None  # the cleaned_data file the stage's table is written to, if any
+    version: int = 1  # bump when build changes
+
+
+def read_raw(path, name, chunksize=None, keep=None):
+    # keep(chunk) -> row mask, applied chunk by chunk so a large file never has to fit in memory whole
+    _, columns, dtypes, encoding = raw_tables[name]
+    if not chunksize:
+        table = pd.read_csv(path, usecols=columns, dtype=dtypes, encoding=encoding)
+        return table[keep(table)] if keep is not None else table
+    chunks = pd.read_csv(path, usecols=columns, dtype=dtypes, encoding=encoding, chunksize=chunksize)
+    return pd.concat([chunk[keep(chunk)] if keep is not None else chunk for chunk in chunks], ignore_index=True)
+
+
+def build_footprints(footprints_path, chunksize=None):
+    footprints = read_raw(footprints_path, "footprints")[["Entity", footprint_column]]
+    footprints = pd.concat([footprints, pd.DataFrame(added_footprints, columns=["Entity", footprint_column])],
+                           ignore_index=True)
+    return footprints.rename(columns={footprint_column: "GHG emissions per kilogram"})
+
+
+def build_nutrient_names(nutrient_names_path, chunksize=None):
+    nutrient_names = read_raw(nutrient_names_path, "nutrient_names")
+    return nutrient_names[nutrient_names["NutrientName"].isin(nutrition_labels)]
+
+
+def build_nutrient_amounts(nutrient_amounts_path, nutrient_names, chunksize=None):
+    # Only the nutrients the app compares; the rest of the (large) amounts file is dropped while reading
+    nutrient_ids = nutrient_names["NutrientID"].to_numpy()
+    return read_raw(nutrient_amounts_path, "nutrient_amounts", chunksize,
+                    keep=lambda chunk: chunk["NutrientID"].isin(nutrient_ids))
+
+
+def convert_nutrient_units(ingredients):
+    unknown = sorted(set(ingredients["NutrientUnit"].unique()) - set(unit_conversion_mapper) - {"g"})
+    if unknown:
+        raise ValueError(f"No conversion to g for nutrient units {unknown}")
+    factors = ingredients["NutrientUnit"].map(unit_conversion_mapper).fillna(1.0).to_numpy(dtype=np.float64)
+    ingredients = ingredients.assign(NutrientValue=ingredients["NutrientValue"].to_numpy(dtype=np.float64) * factors)
+    return ingredients.assign(NutrientUnit="g")
+
+
+def build_ingredients(food_names_path, food_groups_path, nutrient_names, nutrient_amounts, footprints, chunksize=None):
+    food_names = read_raw(food_names_path, "food_names")
+    food_groups = read_raw(food_groups_path, "food_groups")
+    ingredients = food_names.merge(nutrient_amounts, on="FoodID")
+    ingredients = ingredients.merge(food_groups, on="FoodGroupID")
+    ingredients = ingredients.merge(nutrient_names, on="NutrientID")
+    # Stable, so foods that share a description keep FoodID order and the app's first-row lookups are repeatable
+    ingredients = ingredients.sort_values(by=["FoodDescription", "NutrientName", "FoodID"], kind="mergesort")
+    ingredients = convert_nutrient_units(ingredients.dropna(subset=["NutrientValue"]))
+    ingredients = ingredients[~ingredients["FoodGroupName"].isin(excluded_categories)]
+
+    unmapped = sorted(set(ingredients["FoodGroupName"].unique()) - set(map_category))
+    if unmapped:
+        raise ValueError(f"Food groups missing from map_category: {unmapped}")
+    category_emissions = {category: category_mapper(category, footprints, map_category)
+                          for category in ingredients["FoodGroupName"].unique()}
+    ingredients = ingredients.assign(**{"CO2 Emission per Kg": ingredients["FoodGroupName"].map(category_emissions)})
+    return ingredients[["FoodID", "FoodDescription", "FoodGroupID", "NutrientID", "NutrientValue", "FoodGroupName",
+                        "NutrientName", "NutrientUnit", "CO2 Emission per Kg"]]
+
+
+def build_nutrient_table(ingredients, chunksize=None):
+    # One row per food, one column per nutrient; a nutrient a food has no amount for counts as 0
+    nutrient_table = ingredients.pivot(index=["FoodID", "FoodGroupName", "FoodDescription"], columns="NutrientName",
+                                       values="NutrientValue").reset_index()
+    nutrient_table.columns.name = None
+    return nutrient_table.replace(np.nan, 0)
+
+
+def build_units(chunksize=None):
+    return pd.DataFrame([(unit, factor, "g") for unit, factor in kitchen_units],
+                        columns=["from_unit", "conversion_factor", "to_unit"])
+
+
+stages = [Stage("footprints", ("raw:footprints",), build_footprints, table_files["footprints"]),
+          Stage("nutrient_names", ("raw:nutrient_names",), build_nutrient_names),
+          Stage("nutrient_amounts", ("raw:nutrient_amounts", "nutrient_names"), build_nutrient_amounts),
+          Stage("ingredients", ("raw:food_names", "raw:food_groups", "nutrient_names", "nutrient_amounts",
+                                "footprints"), build_ingredients, table_files["ingredients"]),
+          Stage("nutrients", ("ingredients",), build_nutrient_table, table_files["nutrients"]),
+          Stage("units", (), build_units, table_files["units"])]
+
+
+def stage_key(stage, input_keys):
+    digest = hashlib.sha256(json.dumps([stage.name, stage.version, input_keys]).encode())
+    return digest.hexdigest()[:16]
+
+
+def stage_cache_path(stage, key):
+    return os.path.join(cache_dir, f"pipeline-{stage.name}-{key}")
+
+
+manifest_path = os.path.join(cache_dir, "pipeline.json")
+
+
+def read_manifest():
+    try:
+        with open(manifest_path) as manifest:
+            return json.load(manifest)
+    except (OSError, ValueError):
+        return {}
+
+
+def emit_table(table, file_name, key, manifest):
+    # Written only when the stage changed or the file no longer matches what the pipeline last wrote, so an
+    # unchanged file keeps its hash and every cache derived from it stays valid
+    path = os.path.join(data_dir, file_name)
+    recorded = manifest.get(file_name, {})
+    if recorded.get("stage_key") == key and os.path.exists(path) and file_hash(path) == recorded.get("file_hash"):
+        return False
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    table.to_csv(temp_path, index=False)
+    os.replace(temp_path, path)
+    manifest[file_name] = {"stage_key": key, "file_hash": file_hash(path)}
+    return True
+
+
+def input_path(raw_dir, name):
+    # A raw input's file, or None for an earlier stage's table
+    if not name.startswith("raw:"):
+        return None
+    path = os.path.join(raw_dir, raw_tables[name[len("raw:"):]][0])
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Missing raw file {path}; see data_pipeline.py for the expected layout")
+    return path
+
+
+def run(raw_dir=raw_dir, chunksize=default_chunksize, force=False, report=print):
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = read_manifest()
+    keys = {}
+    outputs = {}
+    for stage in stages:
+        started = time.perf_counter()
+        paths = [input_path(raw_dir, name) for name in stage.inputs]
+        keys[stage.name] = key = stage_key(stage, [file_hash(path) if path is not None else keys[name]
+                                                   for name, path in zip(stage.inputs, paths)])
+        path = stage_cache_path(stage, key)
+
+        if os.path.isdir(path) and not force:
+            status = "cached"
+        else:
+            arguments = [raw_path if raw_path is not None else get_output(outputs, keys, name)
+                         for name, raw_path in zip(stage.inputs, paths)]
+            with span("pipeline.stage", stage=stage.name):
+                table = stage.build(*arguments, chunksize=chunksize).reset_index(drop=True)
+            shutil.rmtree(path, ignore_errors=True)
+            write_table_cache(table, path)
+            remove_stale_caches(f"pipeline-{stage.name}", path)
+            outputs[stage.name] = table
+            status = "built"
+
+        if stage.output is not None and emit_table(get_output(outputs, keys, stage.name), stage.output, key,
+                                                   manifest):
+            status += f", wrote {stage.output}"
+        report(f"{stage.name:<18} {status} ({time.perf_counter() - started:.2f} s)")
+
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    return keys
+
+
+def get_output(outputs, keys, name):
+    # A stage's table from this run, or from its cache
+    if name not in outputs:
+        stage = next(stage for stage in stages if stage.name == name)
+        outputs[name] = read_table_cache(stage_cache_path(stage, keys[name]))
+    return outputs[name]
+
+
+def build_artifacts(alternatives=False, report=print):
+    # The binary caches the app loads at import: per-column table caches, the shared name indexes and nutrient
+    # matrix, and optionally the precomputed alternatives
+    started = time.perf_counter()
+    data_loader.clear_tables()
+    for name in table_files:
+        data_loader.load_table(name)
+    import app_functions  # noqa: F401 (builds the shared arrays on import)
+    if alternatives:
+        from precomputed_alternatives import load_alternatives
+        load_alternatives()
+    report(f"{'artifacts':<18} ready ({time.perf_counter() - started:.2f} s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build cleaned_data from the raw nutrient and footprint files.")
+    parser.add_argument("--raw-dir", default=raw_dir, help="directory holding cnf-fcen-csv/ and food-footprints.csv")
+    parser.add_argument("--chunksize", type=int, default=default_chunksize, help="rows per chunk of large raw files, 0 to read them whole")
+    parser.add_argument("--force", action="store_true", help="rebuild every stage")
+    parser.add_argument("--alternatives", action="store_true", help="also precompute the alternatives artifact")
+    args = parser.parse_args()
+
+    run(args.raw_dir, args.chunksize, args.force)
+    build_artifacts(args.alternatives)
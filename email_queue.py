@@ -0,0 +1,132 @@
+import itertools
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from collections import deque
+
+from instrumentation import span
+
+
+class EmailQueue:
+    # Sends emails from one background thread so the Streamlit callback returns immediately.
+    # The authenticated SMTP connection is kept open between messages and closed after idle_timeout seconds.
+    # A sent or failed job's status is kept for status_ttl seconds, after which it reads as "unknown".
+
+    def __init__(self, sender, password=None, host="smtp.gmail.com", port=465, use_ssl=True, max_retries=3,
+                 backoff=1.0, timeout=10.0, idle_timeout=60.0, status_ttl=3600.0):
+        self.sender = sender
+        self.password = password
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.status_ttl = status_ttl
+        self.jobs = queue.Queue()
+        self.statuses = {}
+        # (finish time, job_id) in finishing order; the single worker finishes jobs one after another
+        self.finished = deque()
+        self.job_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.connection = None
+        self.worker = threading.Thread(target=self.run, name="email-queue", daemon=True)
+        self.worker.start()
+
+    def submit(self, message):
+        with self.lock:
+            self.prune()
+            job_id = next(self.job_ids)
+            self.statuses[job_id] = {"state": "queued", "attempts": 0, "error": None}
+        self.jobs.put((job_id, message))
+        return job_id
+
+    def status(self, job_id):
+        with self.lock:
+            self.prune()
+            return dict(self.statuses.get(job_id, {"state": "unknown", "attempts": 0, "error": None}))
+
+    def update_status(self, job_id, **changes):
+        with self.lock:
+            self.statuses[job_id].update(changes)
+            if changes.get("state") in ("sent", "failed"):
+                self.finished.append((time.monotonic(), job_id))
+
+    def prune(self):
+        # Called with the lock held
+        cutoff = time.monotonic() - self.status_ttl
+        while self.finished and self.finished[0][0] < cutoff:
+            self.statuses.pop(self.finished.popleft()[1], None)
+
+    def connect(self):
+        if self.use_ssl:
+            connection = smtplib.SMTP_SSL(self.host, self.port, context=ssl.create_default_context(),
+                                          timeout=self.timeout)
+        else:
+            connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.password is not None:
+            connection.login(self.sender, self.password)
+        return connection
+
+    def get_connection(self):
+        if self.connection is not None:
+            try:
+                if self.connection.noop()[0] == 250:
+                    return self.connection
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.close()
+        self.connection = self.connect()
+        return self.connection
+
+    def close(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self.connection = None
+
+    def send(self, job_id, message):
+        for attempt in range(1, self.max_retries + 1):
+            self.update_status(job_id, state="sending", attempts=attempt)
+            try:
+                with span("email.send", attempt=attempt):
+                    self.get_connection().send_message(message)
+                self.update_status(job_id, state="sent", error=None)
+                return
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                    smtplib.SMTPAuthenticationError) as error:
+                # Retrying won't change the server's answer
+                self.update_status(job_id, state="failed", error=str(error))
+                return
+            except (smtplib.SMTPException, OSError) as error:
+                self.close()
+                self.update_status(job_id, error=str(error))
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+        self.update_status(job_id, state="failed")
+
+    def run(self):
+        while True:
+            try:
+                job_id, message = self.jobs.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self.close()
+                continue
+            try:
+                self.send(job_id, message)
+            except Exception as error:
+                # Anything send() doesn't handle fails this job only; the worker keeps serving the queue.
+                # The connection may be mid-command, so it is dropped rather than reused.
+                self.connection = None
+                self.update_status(job_id, state="failed", error=f"{type(error).__name__}: {error}")
+            finally:
+                self.jobs.task_done()
+
+    def join(self):
+        self.jobs.join()
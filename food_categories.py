@@ -0,0 +1,27 @@
+# CNF food group -> the footprint entity whose emission factor it takes. Shared by the engine and by
+# data_pipeline, which joins the factors onto ingredients2.csv.
+map_category = {"Dairy and Egg Products": "Dairy Products",
+                "Spices and Herbs": "Species",
+                "Fats and Oils": "Oils",
+                "Poultry Products": "Poultry Meat",
+                "Soups, Sauces and Gravies": "Sauces",
+                "Sausages and Luncheon meats": "Pig Meat",
+                "Breakfast cereals": "Cereals",
+                "Fruits and fruit juices": "Fruits",
+                "Pork Products": "Pig Meat",
+                "Vegetables and Vegetable Products": "Other Vegetables",
+                "Nuts and Seeds": "Nuts",
+                "Beef Products": "Beef (dairy herd)",
+                "Finfish and Shellfish Products": "Fish (farmed)",
+                "Legumes and Legume Products": "Legumes",
+                "Lamb, Veal and Game": "Lamb & Mutton",
+                "Baked Products": "Wheat & Rye",
+                "Sweets": "Sweets",
+                "Beverages": "Beverages",
+                "Cereals, Grains and Pasta": "Cereals"}
+
+
+def category_mapper(category, emission_df, map_category):
+    mapped_category = map_category[category]
+    emission_factor = emission_df.loc[emission_df["Entity"] == mapped_category]["GHG emissions per kilogram"].values[0]
+    return emission_factor
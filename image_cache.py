@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from bs4 import BeautifulSoup
+
+from instrumentation import span
+
+default_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "images")
+google_image_search_url = 'https://www.google.com/search?q={0}&tbm=isch'
+
+
+def fetch_google_image(query, session=requests, timeout=5.0, search_url=google_image_search_url):
+    url = search_url.format(query)
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.content, 'lxml')
+    images = soup.findAll('img')
+
+    all_image_list = []
+
+    for image in images:
+        all_image_list.append(image.get('src'))
+
+    # The first <img> on the results page is the Google logo
+    if len(all_image_list) < 2:
+        return None
+    return all_image_list[1]
+
+
+def normalize_query(query):
+    return " ".join(str(query).lower().split())
+
+
+class ImageCache:
+    # Image URL per ingredient: in-memory LRU in front of a JSON-per-entry disk store.
+    # Failed lookups are remembered too (for negative_ttl seconds) so a dead query isn't refetched every rerun.
+
+    def __init__(self, fetcher=fetch_google_image, cache_dir=default_cache_dir, ttl=7 * 24 * 3600,
+                 negative_ttl=3600, max_memory_entries=256, max_disk_bytes=20 * 1024 * 1024):
+        self.fetcher = fetcher
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def is_fresh(self, entry, now):
+        ttl = self.ttl if entry["url"] is not None else self.negative_ttl
+        return now - entry["fetched_at"] < ttl
+
+    def get(self, query):
+        key = normalize_query(query)
+        now = time.time()
+
+        entry = self.get_memory(key, now)
+        if entry is None:
+            entry = self.get_disk(key, now)
+            if entry is not None:
+                self.put_memory(key, entry)
+        if entry is None:
+            entry = self.fetch(query, now)
+            self.put_memory(key, entry)
+            self.put_disk(key, entry)
+        return entry["url"]
+
+    def fetch(self, query, now):
+        with span("image.fetch"):
+            try:
+                url = self.fetcher(query)
+            except Exception:
+                url = None
+        return {"query": query, "url": url, "fetched_at": now}
+
+    def get_memory(self, key, now):
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is None:
+                return None
+            if not self.is_fresh(entry, now):
+                del self.memory[key]
+                return None
+            self.memory.move_to_end(key)
+            return entry
+
+    def put_memory(self, key, entry):
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_memory_entries:
+                self.memory.popitem(last=False)
+
+    def get_disk(self, key, now):
+        path = self.entry_path(key)
+        try:
+            with open(path) as cached:
+                entry = json.load(cached)
+        except (OSError, ValueError):
+            return None
+        if not self.is_fresh(entry, now):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def put_disk(self, key, entry):
+        path = self.entry_path(key)
+        temp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(temp_path, "w") as cached:
+                json.dump(entry, cached)
+            os.replace(temp_path, path)
+            self.evict_disk()
+        except OSError:
+            pass
+
+    def evict_disk(self):
+        # Drop the oldest entries until the store fits in max_disk_bytes
+        entries = []
+        total_bytes = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+        if total_bytes <= self.max_disk_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            if total_bytes <= self.max_disk_bytes:
+                break
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
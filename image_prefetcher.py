@@ -0,0 +1,65 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from image_cache import ImageCache, fetch_google_image, normalize_query
+
+
+def create_http_session(pool_size=8):
+    # One keep-alive connection pool shared by every fetch instead of a new connection per requests.get
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def create_pooled_image_cache(session, timeout=5.0, **cache_options):
+    fetcher = functools.partial(fetch_google_image, session=session, timeout=timeout)
+    return ImageCache(fetcher=fetcher, **cache_options)
+
+
+class ImagePrefetcher:
+    # Warms the image cache for queries the user is likely to ask for next.
+    # get() joins an in-flight prefetch instead of starting a second request for the same query.
+
+    def __init__(self, image_cache, max_workers=4):
+        self.image_cache = image_cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-prefetch")
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def submit(self, query):
+        key = normalize_query(query)
+        with self.lock:
+            future = self.pending.get(key)
+            if future is not None:
+                return future
+            future = self.executor.submit(self.image_cache.get, query)
+            self.pending[key] = future
+        # Outside the lock: a fetch that has already finished runs the callback right here
+        future.add_done_callback(lambda done: self.forget(key, done))
+        return future
+
+    def forget(self, key, future):
+        with self.lock:
+            if self.pending.get(key) is future:
+                del self.pending[key]
+
+    def prefetch(self, queries):
+        for query in queries:
+            self.submit(query)
+
+    def get(self, query, timeout=None):
+        key = normalize_query(query)
+        with self.lock:
+            future = self.pending.get(key)
+        if future is None:
+            return self.image_cache.get(query)
+        return future.result(timeout=timeout)
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,150 @@
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+from app_functions import df, get_table_cache
+
+token_pattern = re.compile(r"[a-z0-9]+")
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    food_id: int
+    description: str
+    category: str
+    score: float
+
+
+def tokenize(text):
+    return token_pattern.findall(str(text).lower())
+
+
+def trigrams(text):
+    # Padded so short words and word starts still produce trigrams
+    padded = f"  {' '.join(tokenize(text))} "
+    return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+
+class IngredientIndex:
+    # Built once per ingredient table. Every word of every FoodDescription goes into a prefix trie whose nodes
+    # hold the foods below them, so autocomplete is one walk per query word; a second trie holds only each
+    # name's first word for ranking. Trigram postings catch typos the tries can't.
+
+    def __init__(self, table):
+        foods = table.drop_duplicates("FoodID")
+        foods = foods[foods["FoodDescription"].notna()]
+        self.food_ids = foods["FoodID"].to_numpy(dtype=np.int64)
+        self.descriptions = foods["FoodDescription"].astype(str).tolist()
+        self.categories = foods["FoodGroupName"].astype(str).tolist()
+        self.category_positions = {}
+        for position, category in enumerate(self.categories):
+            self.category_positions.setdefault(category, []).append(position)
+        self.category_positions = {category: np.array(positions)
+                                   for category, positions in self.category_positions.items()}
+        self.lengths = np.array([len(description) for description in self.descriptions])
+
+        self.trie = {}
+        self.first_word_trie = {}
+        trigram_postings = {}
+        self.trigram_counts = np.zeros(len(self.descriptions), dtype=np.int32)
+        for position, description in enumerate(self.descriptions):
+            tokens = tokenize(description)
+            for token in set(tokens):
+                self.insert(self.trie, token, position)
+            if tokens:
+                self.insert(self.first_word_trie, tokens[0], position)
+            grams = trigrams(description)
+            self.trigram_counts[position] = len(grams)
+            for gram in grams:
+                trigram_postings.setdefault(gram, []).append(position)
+        self.freeze(self.trie)
+        self.freeze(self.first_word_trie)
+        self.trigram_postings = {gram: np.array(positions, dtype=np.int32)
+                                 for gram, positions in trigram_postings.items()}
+
+    def insert(self, trie, token, position):
+        # Positions arrive in increasing order, so each node's list stays sorted; two words of one name that share
+        # a prefix ("beef, brain") reach the same node twice, which must still count the food once
+        node = trie
+        for character in token:
+            node = node.setdefault(character, {})
+            positions = node.setdefault("", [])
+            if not positions or positions[-1] != position:
+                positions.append(position)
+
+    def freeze(self, node):
+        for key, child in node.items():
+            if key == "":
+                node[key] = np.array(child, dtype=np.int32)
+            else:
+                self.freeze(child)
+
+    def prefix_matches(self, token, trie=None):
+        node = self.trie if trie is None else trie
+        for character in token:
+            node = node.get(character)
+            if node is None:
+                return np.empty(0, dtype=np.int32)
+        return node[""]
+
+    def filter_category(self, positions, category):
+        if category is None:
+            return positions
+        return np.intersect1d(positions, self.category_positions.get(category, np.empty(0, dtype=np.int32)))
+
+    def search(self, query, category=None, limit=10, min_similarity=0.3):
+        # Foods whose words start with every query word come first: names that lead with the first query word,
+        # then shortest name first. The rest of the list is filled with the closest trigram matches.
+        tokens = tokenize(query)
+        if not tokens or limit <= 0:
+            return []
+
+        matched = None
+        for token in tokens:
+            positions = self.prefix_matches(token)
+            matched = positions if matched is None else np.intersect1d(matched, positions, assume_unique=True)
+            if not len(matched):
+                break
+        matched = self.filter_category(matched, category)
+        leads = np.isin(matched, self.prefix_matches(tokens[0], self.first_word_trie))
+        prefix_ranking = matched[np.lexsort((matched, self.lengths[matched], ~leads))][:limit]
+        results = [self.result(position, 1.0) for position in prefix_ranking]
+        if len(results) >= limit:
+            return results
+
+        query_grams = trigrams(query)
+        postings = [self.trigram_postings[gram] for gram in query_grams if gram in self.trigram_postings]
+        if not postings:
+            return results
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.descriptions))
+        # Dice coefficient between the query's and each food's trigram sets
+        similarity = 2 * shared / (len(query_grams) + self.trigram_counts)
+        candidates = self.filter_category(np.flatnonzero(similarity >= min_similarity), category)
+        candidates = np.setdiff1d(candidates, prefix_ranking, assume_unique=True)
+        remaining = limit - len(results)
+        if len(candidates) > remaining:
+            candidates = candidates[np.argpartition(-similarity[candidates], remaining - 1)[:remaining]]
+        fuzzy_ranking = candidates[np.lexsort((candidates, -similarity[candidates]))]
+        return results + [self.result(position, float(similarity[position])) for position in fuzzy_ranking]
+
+    def result(self, position, score):
+        return SearchResult(int(self.food_ids[position]), self.descriptions[position], self.categories[position],
+                            score)
+
+    def resolve(self, query, category=None):
+        # Best FoodID for free text, or None; the ID can be passed wherever app_functions expects a food
+        results = self.search(query, category, limit=1)
+        return results[0].food_id if results else None
+
+
+def get_ingredient_index(table=None):
+    return get_table_cache(df if table is None else table, IngredientIndex)
+
+
+def search_ingredients(query, category=None, limit=10):
+    return get_ingredient_index().search(query, category, limit)
+
+
+def resolve_ingredient(query, category=None):
+    return get_ingredient_index().resolve(query, category)
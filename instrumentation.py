@@ -0,0 +1,126 @@
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger("sustainachoice")
+
+# Set SUSTAINACHOICE_TRACE=<file.jsonl> to append one timing record per Streamlit rerun to that file
+trace_path = os.environ.get("SUSTAINACHOICE_TRACE")
+trace_lock = threading.Lock()
+local = threading.local()
+
+
+def configure_logging(level=None):
+    level = level or os.environ.get("SUSTAINACHOICE_LOG_LEVEL", "WARNING")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+
+
+def log_event(level, event, **fields):
+    # Formatting only happens when the level is enabled, so debug events cost one check in production
+    if logger.isEnabledFor(level):
+        formatted = (f"{key}={value!r}" if isinstance(value, str) else f"{key}={value}"
+                     for key, value in fields.items())
+        logger.log(level, "%s %s", event, " ".join(formatted))
+
+
+def write_trace_record(record):
+    with trace_lock:
+        with open(trace_path, "a") as trace_file:
+            trace_file.write(json.dumps(record) + "\n")
+
+
+def record_span(name, duration_ms, fields):
+    log_event(logging.DEBUG, "span", name=name, ms=round(duration_ms, 3), **fields)
+    if trace_path is None:
+        return
+    entry = {"name": name, "ms": duration_ms}
+    current = getattr(local, "trace", None)
+    if current is not None:
+        current["spans"].append(entry)
+    else:
+        # Background threads (image prefetch, email queue) are not part of a rerun
+        write_trace_record({"run": None, "thread": threading.current_thread().name, "spans": [entry]})
+
+
+class span:
+    # Times a block: `with span("lookup.emission", food=food): ...`. A no-op unless debug logging or tracing is on.
+    __slots__ = ("name", "fields", "start")
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+        self.start = None
+
+    def __enter__(self):
+        if trace_path is not None or logger.isEnabledFor(logging.DEBUG):
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.start is not None:
+            record_span(self.name, (time.perf_counter() - self.start) * 1000, self.fields)
+        return False
+
+
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_trace(script):
+    # Call at the top of a Streamlit script; an unfinished trace from an interrupted rerun is flushed first
+    if trace_path is None:
+        return
+    finish_trace()
+    local.trace = {"run": uuid.uuid4().hex, "script": script, "started": time.time(),
+                   "start": time.perf_counter(), "spans": []}
+
+
+def finish_trace():
+    current = getattr(local, "trace", None)
+    if current is None:
+        return
+    local.trace = None
+    current["total_ms"] = (time.perf_counter() - current.pop("start")) * 1000
+    write_trace_record(current)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[position]
+
+
+def summarize_traces(path):
+    # Latency percentiles per span name, plus "rerun" for whole reruns
+    durations = {}
+    with open(path) as trace_file:
+        for line in trace_file:
+            record = json.loads(line)
+            if record.get("total_ms") is not None:
+                durations.setdefault("rerun", []).append(record["total_ms"])
+            for entry in record["spans"]:
+                durations.setdefault(entry["name"], []).append(entry["ms"])
+    return {name: {"count": len(values), "p50_ms": percentile(values, 0.5), "p90_ms": percentile(values, 0.9),
+                   "p99_ms": percentile(values, 0.99), "max_ms": max(values)}
+            for name, values in sorted(durations.items())}
+
+
+if __name__ == '__main__':
+    for name, summary in summarize_traces(sys.argv[1]).items():
+        print(f"{name:<32} n={summary['count']:<6} p50={summary['p50_ms']:9.3f} ms  "
+              f"p90={summary['p90_ms']:9.3f} ms  p99={summary['p99_ms']:9.3f} ms  max={summary['max_ms']:9.3f} ms")
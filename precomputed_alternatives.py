@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from app_functions import AlternativeMatch, df, nutrient_df, footprints_df, nutrient_matrices, \
+    build_food_emissions, build_id_index, find_eligible_category, find_position, get_table_cache, lookup_nutrients, \
+    lookup_value, rank_top_k
+from data_loader import cache_dir, load_array, publish_cache, remove_stale_caches, tables_hash
+from instrumentation import span
+
+# Bump when the ranking or the file layout changes so old artifacts are rebuilt
+artifact_format = 2
+artifact_name = "alternatives"
+artifact_tables = ["ingredients", "nutrients", "footprints"]
+default_k = 32
+
+
+def artifact_path(k=default_k):
+    return os.path.join(cache_dir, f"{artifact_name}-{tables_hash(artifact_tables)}-k{k}-v{artifact_format}")
+
+
+def build_category_food_ids(nutrient_df):
+    # Category -> FoodID of each row of its nutrient_matrices entry
+    food_ids = nutrient_df["FoodID"].to_numpy(dtype=np.int64)
+    return {category: food_ids[positions]
+            for category, positions in nutrient_df.groupby("FoodGroupName", sort=False, observed=True).indices.items()}
+
+
+def build_food_lookup(nutrient_df):
+    # FoodID -> nutrient_df row, plus each row's FoodID, description and emission as nutrient_matrices holds them
+    return (get_table_cache(nutrient_df, build_id_index), nutrient_df["FoodID"].to_numpy(dtype=np.int64),
+            nutrient_df["FoodDescription"].to_numpy(dtype=object), build_food_emissions(nutrient_df, df))
+
+
+def build_emission_values(table):
+    return table["CO2 Emission per Kg"].to_numpy(dtype=np.float64)
+
+
+def rank_food(food, k=default_k):
+    # find_alternative_ranking(df, category, food, k) for each eligible category, as (category, FoodIDs,
+    # distances). Works on rows rather than names, since two foods can share a description.
+    # Module-level so a ProcessPoolExecutor can pickle it.
+    query = lookup_nutrients(food)
+    original_food_emission = lookup_value(df, food, "CO2 Emission per Kg")
+    if query is None or original_food_emission is None:
+        return food, []
+    category_food_ids = get_table_cache(nutrient_df, build_category_food_ids)
+    rankings = []
+    for category in find_eligible_category(df, footprints_df, food):
+        if category not in nutrient_matrices:
+            continue
+        _, matrix, emissions = nutrient_matrices[category]
+        ranking, error_values = rank_top_k(matrix, query, k)
+        lower = emissions[ranking] < original_food_emission
+        rankings.append((category, category_food_ids[category][ranking[lower]], error_values[lower]))
+    return food, rankings
+
+
+class AlternativeArtifact:
+    # Top-k find_alternative_ranking results for every (food, eligible category) pair, as flat arrays.
+    # keys[pair] = FoodID * len(categories) + category code, sorted; the pair's alternatives are
+    # alternative_ids[offsets[pair]:offsets[pair + 1]] (nutrient_df FoodIDs) with the matching distances.
+
+    def __init__(self, categories, k, keys, offsets, alternative_ids, distances):
+        self.categories = categories
+        self.category_codes = {category: code for code, category in enumerate(categories)}
+        self.k = k
+        self.keys = keys
+        self.offsets = offsets
+        self.alternative_ids = alternative_ids
+        self.distances = distances
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find_pair(self, food, category):
+        # Plain array reads rather than lookup_value, which costs a DataFrame column access per call
+        position = find_position(nutrient_df, food)
+        code = self.category_codes.get(category)
+        if position is None or code is None:
+            return None
+        key = int(get_table_cache(nutrient_df, build_food_lookup)[1][position]) * len(self.categories) + code
+        pair = int(np.searchsorted(self.keys, key))
+        if pair == len(self.keys) or self.keys[pair] != key:
+            return None
+        return pair
+
+    def ranking(self, food, category, start=0, stop=None):
+        # find_alternative_ranking(df, category, food, stop)[start:stop] read straight from the arrays, or None
+        # when the artifact can't answer (an unknown pair, or a page past the stored top-k)
+        pair = self.find_pair(food, category)
+        if pair is None:
+            return None
+        begin, end = int(self.offsets[pair]), int(self.offsets[pair + 1])
+        if stop is None:
+            stop = self.k
+        if stop > end - begin and len(nutrient_matrices[category][0]) > self.k:
+            return None
+
+        original_food_emission = float(get_table_cache(df, build_emission_values)[find_position(df, food)])
+        id_positions, _, descriptions, emissions = get_table_cache(nutrient_df, build_food_lookup)
+        page = slice(begin + min(start, end - begin), begin + min(stop, end - begin))
+        rows = [id_positions[food_id] for food_id in self.alternative_ids[page].tolist()]
+        return [AlternativeMatch(food, descriptions[row], category, rank, distance, float(emissions[row]),
+                                 original_food_emission)
+                for rank, row, distance in zip(range(page.start - begin, page.stop - begin), rows,
+                                               self.distances[page].tolist())]
+
+
+def build_artifact(k=default_k, executor=None, chunksize=64):
+    foods = nutrient_df["FoodDescription"].dropna().unique().tolist()
+    categories = list(nutrient_matrices)
+    category_codes = {category: code for code, category in enumerate(categories)}
+    if executor is None:
+        results = map(partial(rank_food, k=k), foods)
+    else:
+        results = executor.map(partial(rank_food, k=k), foods, chunksize=chunksize)
+
+    pairs = {}
+    for food, rankings in results:
+        food_id = int(lookup_value(nutrient_df, food, "FoodID"))
+        for category, alternative_ids, distances in rankings:
+            # Two spellings of one name resolve to the same food; the first one wins
+            pairs.setdefault(food_id * len(categories) + category_codes[category], (alternative_ids, distances))
+
+    keys = np.array(sorted(pairs), dtype=np.int64)
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(pairs[key][0]) for key in keys.tolist()], out=offsets[1:])
+    alternative_ids = np.concatenate([pairs[key][0] for key in keys.tolist()] + [np.empty(0)]).astype(np.int32)
+    distances = np.concatenate([pairs[key][1] for key in keys.tolist()] + [np.empty(0)]).astype(np.float64)
+    return AlternativeArtifact(categories, k, keys, offsets, alternative_ids, distances)
+
+
+artifact_arrays = ["keys", "offsets", "alternative_ids", "distances"]
+
+
+def write_artifact(artifact, path):
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(temp_path, exist_ok=True)
+    for name in artifact_arrays:
+        np.save(os.path.join(temp_path, f"{name}.npy"), getattr(artifact, name))
+    with open(os.path.join(temp_path, "manifest.json"), "w") as manifest:
+        json.dump({"categories": artifact.categories, "k": artifact.k}, manifest)
+    publish_cache(temp_path, path)
+
+
+def read_artifact(path):
+    # Memory-mapped, so every process reading the artifact shares the same pages
+    with open(os.path.join(path, "manifest.json")) as manifest:
+        manifest = json.load(manifest)
+    return AlternativeArtifact(manifest["categories"], manifest["k"],
+                               *[load_array(os.path.join(path, f"{name}.npy")) for name in artifact_arrays])
+
+
+def load_alternatives(k=default_k, build=True, executor=None):
+    # The artifact for the current cleaned_data; a changed table means a new hash and a rebuild.
+    # With build=False a missing artifact gives None and callers rank live.
+    path = artifact_path(k)
+    if os.path.isdir(path):
+        return read_artifact(path)
+    if not build:
+        return None
+
+    with span("alternatives.build", k=k):
+        artifact = build_artifact(k, executor)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_artifact(artifact, path)
+        remove_stale_caches(artifact_name, path)
+    except OSError:
+        # A read-only checkout keeps the in-memory arrays for this process
+        return artifact
+    return read_artifact(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute the ranked alternatives for every ingredient.")
+    parser.add_argument("--k", type=int, default=default_k, help="alternatives kept per (ingredient, category)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        with ProcessPoolExecutor(args.workers) as executor:
+            artifact = load_alternatives(args.k, executor=executor)
+    else:
+        artifact = load_alternatives(args.k)
+    print(f"{len(artifact)} (ingredient, category) pairs, {len(artifact.alternative_ids)} alternatives "
+          f"in {artifact_path(args.k)}")
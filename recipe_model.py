@@ -0,0 +1,99 @@
+import itertools
+from dataclasses import dataclass
+
+import pandas as pd
+
+from app_functions import calculate_total_emission_individual, create_ghg_label, baseline_cutoff
+
+recipe_columns = ["Category:", "Ingredient:", "Amount:", "Unit:", "CO2 Emission (Kg):"]
+
+
+@dataclass(frozen=True)
+class RecipeRow:
+    category: str
+    ingredient: str
+    amount: float
+    unit: str
+    emission: float
+
+
+def make_row(category, ingredient, amount, unit):
+    amount = float(amount)
+    return RecipeRow(category, ingredient, amount, unit,
+                     float(calculate_total_emission_individual(ingredient, amount, unit)) / 1000)
+
+
+class Recipe:
+    # The session's recipe. Rows are keyed by a row ID that never changes, every edit is O(1), and the total
+    # CO2 Emission (Kg) is kept up to date as rows change. to_frame() is only for display.
+
+    def __init__(self):
+        self.rows = {}
+        self.ingredient_rows = {}
+        self.row_ids = itertools.count()
+        self.total_emission = 0.0
+        self.frame = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, category, ingredient, amount, unit):
+        row_id = next(self.row_ids)
+        self.insert(row_id, make_row(category, ingredient, amount, unit))
+        return row_id
+
+    def insert(self, row_id, row):
+        self.rows[row_id] = row
+        self.ingredient_rows.setdefault(row.ingredient, {})[row_id] = None
+        self.total_emission += row.emission
+        self.frame = None
+
+    def remove(self, row_id):
+        self.detach(row_id)
+        row = self.rows.pop(row_id)
+        if not self.rows:
+            # Start the running sum over instead of carrying rounding error into the next recipe
+            self.total_emission = 0.0
+        self.frame = None
+        return row
+
+    def swap(self, row_id, category, ingredient, amount, unit):
+        # Replace a row in place, keeping its ID and position: assigning to an existing key of rows leaves it
+        # where it was, so to_frame() and ingredients() keep their order
+        self.detach(row_id)
+        self.insert(row_id, make_row(category, ingredient, amount, unit))
+
+    def detach(self, row_id):
+        # Take the row out of the ingredient lookup and the totals; the caller then drops or overwrites it
+        row = self.rows[row_id]
+        del self.ingredient_rows[row.ingredient][row_id]
+        if not self.ingredient_rows[row.ingredient]:
+            del self.ingredient_rows[row.ingredient]
+        self.total_emission -= row.emission
+
+    def clear(self):
+        # row_ids keeps counting, so an ID is never reused for a different row
+        self.rows = {}
+        self.ingredient_rows = {}
+        self.total_emission = 0.0
+        self.frame = None
+
+    def rows_for(self, ingredient):
+        # Row IDs grow in table order, so sorting them gives the rows as to_frame() lists them
+        return sorted(self.ingredient_rows.get(ingredient, ()))
+
+    def ingredients(self):
+        # Each ingredient once, in the order it first appears in the table
+        return list(dict.fromkeys(row.ingredient for row in self.rows.values()))
+
+    def evaluate(self):
+        # Same answer as evaluate_recipe(self.to_frame()) without summing the column again
+        return self.total_emission, create_ghg_label(self.total_emission, baseline_cutoff)
+
+    def to_frame(self):
+        # Built at most once per edit; the row IDs are the index
+        if self.frame is None:
+            self.frame = pd.DataFrame([[row.category, row.ingredient, row.amount, row.unit, row.emission]
+                                       for row in self.rows.values()],
+                                      index=pd.Index(list(self.rows), dtype="int64"), columns=recipe_columns)
+        return self.frame
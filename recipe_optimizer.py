@@ -0,0 +1,106 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from app_functions import AlternativeMatch, convert_units, create_ghg_label, evaluate_recipe, \
+    find_pareto_alternatives, baseline_cutoff, df, footprints_df
+
+
+@dataclass(frozen=True)
+class RecipeSwap:
+    row: object
+    ingredient: str
+    grams: float
+    match: AlternativeMatch
+    co2_saving_kg: float
+
+
+@dataclass(frozen=True)
+class SwapPlan:
+    swaps: tuple
+    original_emission: float
+    optimized_emission: float
+    original_label: str
+    optimized_label: str
+    distance_used: float
+    distance_budget: float
+
+
+def default_candidates(food):
+    return find_pareto_alternatives(df, footprints_df, food)
+
+
+def solve_swaps(options, distance_budget, resolution=1000):
+    # Multiple-choice knapsack: at most one (distance, saving) option per row, total distance <= distance_budget,
+    # maximum total saving. Distances are rounded up onto `resolution` steps, so a plan never overshoots the
+    # budget; it can miss a better plan that needed the rounded-away slack.
+    if distance_budget <= 0:
+        # Only options that cost no distance at all fit
+        resolution = 0
+
+    def distance_steps(distance):
+        # Any positive distance takes at least one step, so only truly free swaps cost nothing
+        if distance <= 0:
+            return 0
+        if resolution == 0:
+            return 1
+        return max(1, int(math.ceil(distance * resolution / distance_budget - 1e-9)))
+
+    best = np.zeros(resolution + 1)
+    choices = np.full((len(options), resolution + 1), -1, dtype=np.int16)
+    for row, row_options in enumerate(options):
+        row_best = best.copy()
+        for choice, (distance, saving) in enumerate(row_options):
+            steps = distance_steps(distance)
+            if steps > resolution or saving <= 0:
+                continue
+            # Taking this option with `budget` left means the other rows had `budget - steps`
+            with_option = best[:resolution + 1 - steps] + saving
+            improved = with_option > row_best[steps:]
+            row_best[steps:][improved] = with_option[improved]
+            choices[row, steps:][improved] = choice
+        best = row_best
+
+    # Walk back from the full budget to recover each row's choice
+    picked = [-1] * len(options)
+    budget = resolution
+    for row in range(len(options) - 1, -1, -1):
+        choice = int(choices[row, budget])
+        picked[row] = choice
+        if choice >= 0:
+            budget -= distance_steps(options[row][choice][0])
+    return picked
+
+
+def optimize_recipe(recipe, distance_budget, candidates=default_candidates, resolution=1000):
+    # recipe has the streamlit_app columns (Ingredient:, Amount:, Unit:, CO2 Emission (Kg):). Returns the set of
+    # swaps with the lowest evaluate_recipe total whose nutrient distances add up to at most distance_budget.
+    # candidates(food) gives the AlternativeMatch options per ingredient, e.g. a cached Pareto frontier.
+    grams = np.asarray(convert_units(recipe["Amount:"].to_numpy(dtype=np.float64), recipe["Unit:"].to_numpy()))
+    row_emissions = recipe["CO2 Emission (Kg):"].to_numpy(dtype=np.float64)
+
+    options = []
+    matches = []
+    for ingredient, amount, emission in zip(recipe["Ingredient:"].tolist(), grams, row_emissions):
+        row_matches = list(candidates(ingredient))
+        # Swapping keeps the amount, so the saving scales with the row's own emission
+        options.append([(match.error_value, emission * (1 - match.emission / match.original_emission))
+                        if match.original_emission > 0 else (match.error_value, 0.0) for match in row_matches])
+        matches.append(row_matches)
+
+    picked = solve_swaps(options, distance_budget, resolution)
+
+    swaps = []
+    for row, ingredient, amount, row_options, row_matches, choice in zip(recipe.index, recipe["Ingredient:"].tolist(),
+                                                                        grams, options, matches, picked):
+        if choice >= 0:
+            swaps.append(RecipeSwap(row, ingredient, float(amount), row_matches[choice],
+                                    float(row_options[choice][1])))
+
+    original_emission, original_label = evaluate_recipe(recipe)
+    optimized_emission = original_emission - sum(swap.co2_saving_kg for swap in swaps)
+    return SwapPlan(tuple(swaps), float(original_emission), float(optimized_emission), original_label,
+                    create_ghg_label(optimized_emission, baseline_cutoff),
+                    float(sum(swap.match.error_value for swap in swaps)), float(distance_budget))
+
@@ -2,21 +2,29 @@ import streamlit as st
 from streamlit_option_menu import option_menu
 import pandas as pd
 import math
+import logging
 
-import requests
-from bs4 import BeautifulSoup
 from io import BytesIO
 from PIL import Image
 from datetime import datetime
-import lxml
 
 from email.message import EmailMessage
-import ssl
-import smtplib
 
-from app_functions import calculate_total_emission_individual, convert_units, baseline_cutoff, evaluate_recipe, \
-    find_eligible_category, find_closest_alternative, compare_to_vehicle, calculate_num_trees
-from email_sender import email_sender, email_password
+from app_cache import refresh_data
+
+# Reloads the engine if cleaned_data changed, before the imports below bind its tables
+refresh_data()
+
+from app_functions import calculate_total_emission_individual, convert_units, baseline_cutoff, \
+    find_eligible_category, find_alternative_ranking, compare_to_vehicle, calculate_num_trees, df, \
+    footprints_df
+from app_cache import get_category_options, get_ingredient_options, get_unit_options, get_nutrient_table, \
+    get_image_prefetcher, get_email_queue, get_pareto_alternatives, get_alternatives_artifact
+from email_sender import email_sender
+from ingredient_search import search_ingredients
+from recipe_model import Recipe
+from recipe_optimizer import optimize_recipe
+from instrumentation import configure_logging, log_event, start_trace, finish_trace
 
 st.set_page_config(
     page_title="SustainaChoice",
@@ -24,10 +32,8 @@ st.set_page_config(
     layout="wide"
 )
 
-df = pd.read_csv("cleaned_data/ingredients2.csv")
-nutrient_df = pd.read_csv("cleaned_data/nutrient_df.csv")
-unit_df = pd.read_csv("cleaned_data/unit_conversion.csv")
-footprints_df = pd.read_csv("cleaned_data/carbon_footprints.csv")
+configure_logging()
+start_trace("streamlit_app")
 
 st.markdown("<h1 style='text-align: center;'>SustainaChoice</h1>", unsafe_allow_html=True)
 
@@ -40,10 +46,8 @@ with image_columns[1]:
 with image_columns[2]:
     st.write("")
 
-user_df = pd.DataFrame(columns=["Category:", "Ingredient:", "Amount:", "Unit:", "CO2 Emission (Kg):"])
-
-if "df" not in st.session_state:
-    st.session_state.df = user_df
+if "recipe" not in st.session_state:
+    st.session_state.recipe = Recipe()
 
 if "eval_button" not in st.session_state:
     st.session_state["eval_button"] = False
@@ -53,17 +57,7 @@ if "show_alternative_panel" not in st.session_state:
 
 
 def google_search_image(query):
-    url = 'https://www.google.com/search?q={0}&tbm=isch'.format(query)
-    content = requests.get(url).content
-    soup = BeautifulSoup(content, 'lxml')
-    images = soup.findAll('img')
-
-    all_image_list = []
-
-    for image in images:
-        all_image_list.append(image.get('src'))
-
-    return all_image_list[1]
+    return get_image_prefetcher().get(query)
 
 
 placeholder = st.empty()
@@ -74,31 +68,36 @@ with st.expander("➕ Click to Add Ingredient"):
     with ingredient_columns[0]:
         st.session_state["is_expanded"] = True
         selected_category = st.selectbox(
-            "Category:", df["FoodGroupName"].unique(), key="input_col1")
+            "Category:", get_category_options(), key="input_col1")
     with ingredient_columns[1]:
-        df_ingredient = df[df["FoodGroupName"] == st.session_state.input_col1]
-        selected_ingredient = st.selectbox(
-            "Ingredient:", df_ingredient["FoodDescription"].unique(), key="input_col2")
+        ingredient_query = st.text_input("Search Ingredient:", key="ingredient_query",
+                                         placeholder="Type part of a name, typos are fine")
+        ingredient_options = get_ingredient_options()[st.session_state.input_col1]
+        if ingredient_query:
+            search_results = search_ingredients(ingredient_query, st.session_state.input_col1, limit=20)
+            if search_results:
+                ingredient_options = [result.description for result in search_results]
+            else:
+                st.caption("No matching ingredient in this category.")
+        selected_ingredient = st.selectbox("Ingredient:", ingredient_options, key="input_col2")
     with ingredient_columns[2]:
         selected_amount = st.number_input("Amount: ", key="input_col3", step=0.1, min_value=0.0)
         if type(selected_amount) == str:
             st.error("Please enter a numeric value.")
     with ingredient_columns[3]:
         selected_unit = st.selectbox(
-            "Unit:", unit_df["from_unit"].unique(), key="input_col4"
+            "Unit:", get_unit_options(), key="input_col4"
         )
 
     nutrition_tab, metrics_tab = st.tabs(["Nutritional Information", "Summary Metrics"])
     with nutrition_tab:
         st.subheader(f"{selected_ingredient}")
-        nutrient_df_selected = nutrient_df[nutrient_df["FoodDescription"] == selected_ingredient].iloc[:, 3:15]
-
-        st.image(google_search_image(selected_ingredient), width=200)
+        nutrient_df_selected = get_nutrient_table(selected_ingredient)
 
-        columns = ["Alcohol", "Caffeine", "Calcium", "Carbohydrate", "Cholesterol", "Copper", "Fats",
-                   "Fatty Acids (Polysaturated)", "Fatty Acids (Unsaturated)", "Fibre", "Iron", "Lactose"]
+        image_url = google_search_image(selected_ingredient)
+        if image_url:
+            st.image(image_url, width=200)
 
-        nutrient_df_selected.columns = columns
         st.write(
             f"Nutrition Information for 100g of {selected_ingredient}, retrieved from [Statistics Canada](https://www.canada.ca/en/health-canada/services/food-nutrition/healthy-eating/nutrient-data/canadian-nutrient-file-2015-download-files.html).")
         st.table(nutrient_df_selected)
@@ -123,8 +122,7 @@ with st.expander("➕ Click to Add Ingredient"):
     submit = st.button("Add Ingredient", key="submit_button")
 
     if submit:
-        st.session_state.df.loc[len(st.session_state.df)] = [selected_category, selected_ingredient, selected_amount,
-                                                             selected_unit, (total_emission / 1000)]
+        st.session_state.recipe.add(selected_category, selected_ingredient, selected_amount, selected_unit)
 
 if "reset" not in st.session_state:
     st.session_state["reset"] = False
@@ -135,8 +133,7 @@ def reset_df():
     turn_reset_on()
     st.session_state["finalize_recipe"] = False
     if st.session_state["reset"] == True:
-        st.session_state.df = pd.DataFrame(
-            columns=["Category:", "Ingredient:", "Amount:", "Unit:", "CO2 Emission (Kg):"])
+        st.session_state.recipe.clear()
         st.success("Your recipe has been resetted.", icon="✅")
         st.session_state["reset"] = False
 
@@ -145,11 +142,11 @@ def turn_reset_on():
     st.session_state["reset"] = True
 
 
-if len(st.session_state.df) > 0:
+if len(st.session_state.recipe) > 0:
     st.header("Your Recipe:")
     if st.session_state["reset"] != True:
         # Create a copy of the dataframe to display
-        display_df = st.session_state.df.copy()
+        display_df = st.session_state.recipe.to_frame().copy()
 
         # Add a delete button column
         display_df['Delete'] = False
@@ -172,12 +169,12 @@ if len(st.session_state.df) > 0:
 
         # Check if any rows are marked for deletion
         if st.button("Remove Selected Items", key="delete_button"):
-            # Get indices of rows to delete
+            # The index holds the recipe's row IDs
             rows_to_delete = edited_df[edited_df['Delete']].index
 
             if len(rows_to_delete) > 0:
-                # Remove the rows from the original dataframe
-                st.session_state.df = st.session_state.df.drop(rows_to_delete).reset_index(drop=True)
+                for row_id in rows_to_delete:
+                    st.session_state.recipe.remove(row_id)
                 st.success(f"Removed {len(rows_to_delete)} item(s) from your recipe.", icon="✅")
                 # Rerun to update the display immediately
                 st.rerun()
@@ -206,7 +203,7 @@ if evaluate_submit:
     st.header("See My Results:")
     results_tab_col1, results_tab_col2 = st.columns([3, 4])
     with results_tab_col1:
-        total_emission_recipe, label = evaluate_recipe(st.session_state.df)
+        total_emission_recipe, label = st.session_state.recipe.evaluate()
         st.session_state["all_total_emission"] = total_emission_recipe
         delta_value = baseline_cutoff - total_emission_recipe
         delta_value = round(delta_value, 3)
@@ -259,11 +256,55 @@ def turn_swap_category_on():
     st.session_state["swap_category"] = swap_category
 
 
+alternative_page_size = 10
+
+# Searches every eligible category at once and pages through the Pareto frontier of distance vs. CO2
+all_categories_option = "All eligible categories"
+
+if "alternative_rankings" not in st.session_state:
+    st.session_state["alternative_rankings"] = {}
+
+
+def get_ranked_alternative(food, category, num_try):
+    # Rank once per (food, category) and page through the cached list; only widen the top-k when paging past it
+    rankings = st.session_state["alternative_rankings"]
+    if category == all_categories_option:
+        ranking = get_pareto_alternatives(food)
+        rankings[(food, category)] = (len(ranking), ranking)
+    else:
+        k, ranking = rankings.get((food, category), (0, []))
+        if num_try >= len(ranking) and len(ranking) == k:
+            k = max(alternative_page_size, 2 * (num_try + 1))
+            # Precomputed pages first; only pages past the artifact's top-k are ranked live
+            ranking = get_alternatives_artifact().ranking(food, category, 0, k)
+            if ranking is None:
+                ranking = find_alternative_ranking(df, category, food, k)
+            rankings[(food, category)] = (k, ranking)
+
+    if num_try < len(ranking):
+        return ranking[num_try]
+    return None
+
+
+alternative_prefetch_count = 3
+
+
+def prefetch_alternative_images(food, category, num_try):
+    # Fetch the next few suggestions' images in the background so "Another Selection" renders immediately
+    _, ranking = st.session_state["alternative_rankings"].get((food, category), (0, []))
+    upcoming = ranking[num_try + 1:num_try + 1 + alternative_prefetch_count]
+    get_image_prefetcher().prefetch([match.alternative for match in upcoming])
+
+
 def find_alternative(food, category, num_try=0):
-    replacement_ingredient = find_closest_alternative(df, footprints_df, category, food, num_try)
+    match = get_ranked_alternative(food, category, num_try)
+    replacement_ingredient = match.alternative if match is not None else None
     st.markdown(f"<h3 style='color:green'>{replacement_ingredient}</h3>", unsafe_allow_html=True)
     st.write(f"{replacement_ingredient} is the closest alternative to your chosen ingredient.")
-    return replacement_ingredient
+    if match is not None and category == all_categories_option:
+        st.caption(f"From {match.category}: {match.emission:.2f} kg CO2 per kg "
+                   f"(vs. {match.original_emission:.2f} kg for {food}).")
+    return match
 
 
 def another_suggestion(food, category, num_try):
@@ -289,29 +330,28 @@ def change_dataframe():
     selected_ingredient_swap = st.session_state.get("selected_ingredient_swap")
     swap_category = st.session_state.get("swap_category")
 
-    # Ensure the ingredient exists in the DataFrame before replacing
-    if st.session_state.df[st.session_state.df["Ingredient:"].isin([st.session_state.ingredient])].empty:
-        st.warning("Ingredient not found in the DataFrame!")
+    # Ensure the ingredient exists in the recipe before replacing
+    row_ids = st.session_state.recipe.rows_for(st.session_state.ingredient)
+    if not row_ids:
+        st.warning("Ingredient not found in the recipe!")
         return
 
-    # Iterate over the rows of the DataFrame to replace matching ingredients
-    for ind, row in st.session_state.df.iterrows():
-        if row["Ingredient:"] == st.session_state.ingredient and selected_ingredient_swap and swap_category:
-            # Replace the ingredient, amount, and category with the new values
-            st.session_state.df.loc[ind, "Ingredient:"] = selected_ingredient_swap
-            st.session_state.df.loc[ind, "Amount:"] = current_amount
-            st.session_state.df.loc[ind, "Category:"] = swap_category
-
-            # Calculate the new CO2 Emission for the swapped ingredient and update the DataFrame
-            emission_value = calculate_total_emission_individual(
-                selected_ingredient_swap, current_amount, "g"
-            ) / 1000  # Emission in Kg
-            st.session_state.df.loc[ind, "CO2 Emission (Kg):"] = emission_value
+    # Replace the ingredient, amount, and category in every row that has it; emissions are recomputed
+    if selected_ingredient_swap and swap_category:
+        for row_id in row_ids:
+            st.session_state.recipe.swap(row_id, swap_category, selected_ingredient_swap, current_amount, "g")
 
     # Hide the alternative panel after making the swap
     st.session_state["show_alternative_panel"] = False
 
 
+def apply_plan(plan):
+    st.session_state["eval_button"] = True
+    for swap in plan.swaps:
+        st.session_state.recipe.swap(swap.row, swap.match.category, swap.match.alternative, swap.grams, "g")
+    st.session_state["show_alternative_panel"] = False
+
+
 def finalize_recipe():
     st.session_state["eval_button"] = True
     st.session_state["finalize_recipe"] = True
@@ -337,13 +377,18 @@ def send_email():
     em["To"] = email_receiver
     em["Subject"] = subject
     em.set_content(final_df.to_string())
-    st.info("Your recipe has been sent to your email!", icon="ℹ️")
 
-    context = ssl.create_default_context()
+    st.session_state["email_job"] = get_email_queue().submit(em)
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as smtp:
-        smtp.login(email_sender, email_password)
-        smtp.sendmail(email_sender, email_receiver, em.as_string())
+
+def show_email_status():
+    email_status = get_email_queue().status(st.session_state["email_job"])
+    if email_status["state"] == "sent":
+        st.info("Your recipe has been sent to your email!", icon="ℹ️")
+    elif email_status["state"] == "failed":
+        st.error(f"Your recipe could not be sent: {email_status['error']}", icon="🚫")
+    elif email_status["state"] != "unknown":
+        st.info("Your recipe is on its way to your email.", icon="ℹ️")
 
 
 if "hold_on_df" not in st.session_state:
@@ -353,7 +398,7 @@ if st.session_state["finalize_recipe"] == True:
     st.divider()
     st.session_state["eval_button"] = False
     final_image_col, final_text_col = st.columns([4, 7])
-    changed_emission = st.session_state.df["CO2 Emission (Kg):"].sum()
+    changed_emission = st.session_state.recipe.total_emission
     subtracted_emission = st.session_state.all_total_emission - changed_emission
     compare_to_vehicle_value = compare_to_vehicle(subtracted_emission)
     compare_to_tree = calculate_num_trees(subtracted_emission)
@@ -386,9 +431,11 @@ if st.session_state["finalize_recipe"] == True:
             st.write(
                 f'Total {"{:.3f}".format(subtracted_emission)} Kg of CO2 equivalent has been reduced compared to your original recipe!')
             email_receiver = st.text_input("Your email address:")
-            final_df = st.session_state.df
+            final_df = st.session_state.recipe.to_frame()
             st.button("\nSend Email", key="send_email", on_click=send_email)
             st.write("Make sure to press Enter before you click on Send Email button.")
+            if "email_job" in st.session_state:
+                show_email_status()
         elif changed_emission >= st.session_state.total_emission:
             st.session_state["hold_on_df"] = True
             st.markdown("<h3 style='color:blue'>Hold On...</h3>", unsafe_allow_html=True)
@@ -407,12 +454,14 @@ if "eval_button" in st.session_state and st.session_state["eval_button"] and st.
         st.subheader("Alternative Recipe:")
         st.markdown(
             "Alternative Recipe suggests an ingredient of :green[lower carbon emission] footprint that has the closest nutritional values with the original ingredient.")
-        original_ingredients = st.session_state.df["Ingredient:"].unique()
+        original_ingredients = st.session_state.recipe.ingredients()
         original_ingredients_select = st.selectbox("Select Ingredient to Swap:", original_ingredients,
                                                    key="recipe_ingredient", on_change=turn_swap_category_on)
         st.session_state["original_ingredient"] = original_ingredients_select
         st.session_state["ingredient"] = st.session_state.original_ingredient
         eligible_categories = find_eligible_category(df, footprints_df, st.session_state.ingredient)
+        if eligible_categories:
+            eligible_categories = [all_categories_option] + eligible_categories
         st.session_state["category"] = eligible_categories
         try:
             swap_category = st.selectbox("Swap with Ingredient From Category:", st.session_state.category,
@@ -420,19 +469,43 @@ if "eval_button" in st.session_state and st.session_state["eval_button"] and st.
         except:
             swap_category = st.selectbox("Swap with Ingredient From Category:", "",
                                          key="swap_no_category")
+
+        with st.expander("Optimize My Whole Recipe"):
+            st.write("Picks the swaps that cut the most CO2 while keeping the total change in nutrients "
+                     "within the budget.")
+            distance_budget = st.number_input("Nutrient Distance Budget:", min_value=0.0, value=5000.0, step=500.0,
+                                              key="distance_budget")
+            swap_plan = optimize_recipe(st.session_state.recipe.to_frame(), distance_budget, get_pareto_alternatives)
+            if swap_plan.swaps:
+                st.dataframe(pd.DataFrame([{"Ingredient:": swap.ingredient, "Swap With:": swap.match.alternative,
+                                            "Category:": swap.match.category,
+                                            "CO2 Saved (Kg):": round(swap.co2_saving_kg, 3)}
+                                           for swap in swap_plan.swaps]), hide_index=True)
+                st.write(f"{round(swap_plan.original_emission, 3)} Kg ({swap_plan.original_label}) → "
+                         f"{round(swap_plan.optimized_emission, 3)} Kg ({swap_plan.optimized_label})")
+                st.button("Apply Plan", key="apply_plan", on_click=apply_plan, args=(swap_plan,),
+                          use_container_width=True)
+            else:
+                st.write("No swap fits within this budget.")
     with col0:
         st.write("")
     with col2:
         # Get the alternative ingredient from the function
-        selected_ingredient_swap = find_alternative(original_ingredients_select, swap_category,
-                                                    st.session_state.alternative_number)
+        alternative_match = find_alternative(original_ingredients_select, swap_category,
+                                             st.session_state.alternative_number)
+        selected_ingredient_swap = alternative_match.alternative if alternative_match is not None else None
 
         # Check if the alternative was found, if not return early
         if selected_ingredient_swap is None:
             st.warning("No valid alternative found.")
         else:
+            prefetch_alternative_images(original_ingredients_select, swap_category,
+                                        st.session_state.alternative_number)
+
             # Show the image for the alternative ingredient
-            st.image(google_search_image(selected_ingredient_swap), width=200)
+            image_url = google_search_image(selected_ingredient_swap)
+            if image_url:
+                st.image(image_url, width=200)
 
             # Create columns for buttons
             button_col1, image_col, button_col2 = st.columns(3)
@@ -445,54 +518,35 @@ if "eval_button" in st.session_state and st.session_state["eval_button"] and st.
                 # Check if the save button was clicked
                 if save_button:
                     # Ensure replacement amount is valid
-                    print("Save button clicked!")
+                    log_event(logging.DEBUG, "save.clicked", ingredient=st.session_state.ingredient)
                     replacement_amount = st.session_state.get("replacement_amount",
                                                               0.0)  # Fetch from session or default to 0
                     if replacement_amount == 0:
                         st.warning("Please enter a valid amount.")
                     else:
-                        # Fetch the original ingredient's emission
-                        print("Calculating original emission...")
-                        original_emission = calculate_total_emission_individual(
-                            st.session_state.ingredient,
-                            st.session_state.df[st.session_state.df["Ingredient:"] == st.session_state.ingredient][
-                                "Amount:"].values[0],
-                            st.session_state.df[st.session_state.df["Ingredient:"] == st.session_state.ingredient][
-                                "Unit:"].values[0]
-                        ) / 1000  # Convert to Kg
-                        print(st.session_state.df[st.session_state.df["Ingredient:"] == st.session_state.ingredient][
-                                "Amount:"].values[0])
-
-                        print(f"Original emission for {st.session_state.ingredient}: {original_emission} Kg")
+                        # The original ingredient's emission, from its first row in the recipe
+                        recipe = st.session_state.recipe
+                        original_rows = recipe.rows_for(st.session_state.ingredient)
+                        original_emission = recipe.rows[original_rows[0]].emission
 
                         # Calculate the new emission for the replacement ingredient
-                        print(df[df["FoodDescription"].str.contains("sweet and sour", case=False)])
                         new_emission = calculate_total_emission_individual(
                             selected_ingredient_swap,
                             replacement_amount,
                             "g"  # Replacement is assumed to be in grams
                         ) / 1000  # Convert to Kg
-                        print(selected_ingredient_swap)
 
-                        print(f"New emission for {selected_ingredient_swap}: {new_emission} Kg")
+                        log_event(logging.DEBUG, "save.compare", original=st.session_state.ingredient,
+                                  original_kg=original_emission, replacement=selected_ingredient_swap,
+                                  replacement_kg=new_emission)
 
-                        # If the new emission is lower, delete the original ingredient and add the new one
+                        # If the new emission is lower, the alternative takes the original's first row
+                        # (the replacement is assumed to be in grams) and any other rows of it are dropped
                         if new_emission < original_emission:
-                            # Delete the original ingredient row
-                            st.session_state.df = st.session_state.df[st.session_state.df["Ingredient:"]
-                                                                      != st.session_state.ingredient]
-
-                            # Add the new ingredient (alternative) to the DataFrame using pd.concat
-                            new_row = pd.DataFrame([{
-                                "Ingredient:": selected_ingredient_swap,
-                                "Amount:": replacement_amount,
-                                "Unit:": "g",  # assuming the unit is grams
-                                "Category:": swap_category,
-                                "CO2 Emission (Kg):": new_emission
-                            }])
-
-                            # Concatenate the new row to the existing DataFrame
-                            st.session_state.df = pd.concat([st.session_state.df, new_row], ignore_index=True)
+                            recipe.swap(original_rows[0], alternative_match.category, selected_ingredient_swap,
+                                        replacement_amount, "g")
+                            for row_id in original_rows[1:]:
+                                recipe.remove(row_id)
 
                             st.success("Replaced successfully.")
                             st.session_state["success_message"] = True
@@ -514,3 +568,5 @@ if "eval_button" in st.session_state and st.session_state["eval_button"] and st.
             with button_col2:
                 finish_button = st.button("Finalize My Recipe!", key="finalize_button", on_click=finalize_recipe,
                                           use_container_width=True)
+
+finish_trace()
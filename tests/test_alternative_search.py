@@ -0,0 +1,123 @@
+import os
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import require_cleaned_data
+
+require_cleaned_data()
+
+import app_functions  # noqa: E402
+from app_functions import find_closest_alternative, compute_nutrient_errors, nutrient_columns, \
+    nutrient_matrices  # noqa: E402
+from data_loader import data_dir, table_files  # noqa: E402
+
+
+# The original row-by-row scorer, kept here as the reference. It reads the CSVs itself so the compact tables and
+# caches under test play no part in it, and it no longer writes the chosen alternative back into df.
+@pytest.fixture(scope="module")
+def reference_tables():
+    return (pd.read_csv(os.path.join(data_dir, table_files["ingredients"])),
+            pd.read_csv(os.path.join(data_dir, table_files["nutrients"])))
+
+
+def reference_errors(nutrient_df, category, food):
+    food_row = nutrient_df[nutrient_df["FoodDescription"] == food]
+    candidates = nutrient_df[nutrient_df["FoodGroupName"] == category].copy()
+    candidates["Error Value"] = 0.0
+    for ind, row in candidates.iterrows():
+        all_error = 0.0
+        for column in nutrient_columns:
+            all_error += (row[column] - food_row[column].values[0]) ** 2
+        candidates.at[ind, "Error Value"] = all_error
+    return candidates
+
+
+def reference_alternative(df, nutrient_df, category, food, within_category_attempt):
+    if nutrient_df[nutrient_df["FoodDescription"] == food].empty:
+        return None
+    min_error_df = reference_errors(nutrient_df, category, food).sort_values(by=["Error Value"], ascending=True)
+    try:
+        best_alternative = min_error_df.iloc[within_category_attempt]["FoodDescription"]
+    except IndexError:
+        return None
+    best_alternative_emission = df[df["FoodDescription"] == best_alternative]["CO2 Emission per Kg"].values[0]
+    original_food_emission = df[df["FoodDescription"] == food]["CO2 Emission per Kg"].values[0]
+    if best_alternative_emission < original_food_emission:
+        return best_alternative
+    return None
+
+
+def sample_cases(count=100, seed=1):
+    rng = random.Random(seed)
+    foods = app_functions.nutrient_df["FoodDescription"].astype(str).tolist()
+    categories = list(app_functions.map_category) + ["Not a category"]
+    return [(rng.choice(foods), rng.choice(categories), rng.choice([0, 1, 2, 5, 50, 10000])) for _ in range(count)]
+
+
+def test_matches_reference_scorer(reference_tables):
+    df, nutrient_df = reference_tables
+    mismatches = []
+    for food, category, attempt in sample_cases():
+        match = find_closest_alternative(app_functions.df, app_functions.footprints_df, category, food, attempt)
+        found = match.alternative if match is not None else None
+        expected = reference_alternative(df, nutrient_df, category, food, attempt)
+        if found != expected:
+            mismatches.append((food, category, attempt, found, expected))
+    assert mismatches == []
+
+
+def test_nutrient_errors_match_reference(reference_tables):
+    _, nutrient_df = reference_tables
+    for food, category, _ in sample_cases(count=20, seed=2):
+        if category not in nutrient_matrices:
+            continue
+        descriptions, matrix, _ = nutrient_matrices[category]
+        query = nutrient_df.loc[nutrient_df["FoodDescription"] == food, nutrient_columns].to_numpy()[0]
+        expected = reference_errors(nutrient_df, category, food)
+        assert list(descriptions) == expected["FoodDescription"].tolist()
+        np.testing.assert_array_equal(compute_nutrient_errors(matrix, query), expected["Error Value"].to_numpy())
+
+
+def test_unknown_food():
+    assert find_closest_alternative(app_functions.df, app_functions.footprints_df, "Nuts and Seeds", "Not a food",
+                                    0) is None
+
+
+def reference_rankings(df, nutrient_df):
+    # The reference scorer's arithmetic, vectorized per category: float64 values straight from the CSV, squared
+    # errors added column by column in the same order, then the same quicksort as sort_values
+    first_emissions = df.drop_duplicates("FoodDescription").set_index("FoodDescription")["CO2 Emission per Kg"]
+    categories = {category: (group["FoodDescription"].tolist(), group[nutrient_columns].to_numpy(dtype=np.float64))
+                  for category, group in nutrient_df.groupby("FoodGroupName", sort=False)}
+    first_rows = nutrient_df.drop_duplicates("FoodDescription")
+    for food, values in zip(first_rows["FoodDescription"].tolist(),
+                            first_rows[nutrient_columns].to_numpy(dtype=np.float64)):
+        for category in app_functions.find_eligible_category(app_functions.df, app_functions.footprints_df, food):
+            if category not in categories:
+                continue
+            descriptions, matrix = categories[category]
+            error_values = (matrix[:, 0] - values[0]) ** 2
+            for column in range(1, matrix.shape[1]):
+                error_values = error_values + (matrix[:, column] - values[column]) ** 2
+            ranking = np.argsort(error_values, kind="quicksort")
+            for attempt in range(min(3, len(ranking))):
+                alternative = descriptions[ranking[attempt]]
+                lower = first_emissions[alternative] < first_emissions[food]
+                yield food, category, attempt, alternative if lower else None
+
+
+def test_matches_reference_for_every_eligible_category(reference_tables):
+    # Exhaustive, since near-ties that only reorder at reduced precision are too rare for a random sample
+    mismatches = []
+    checked = 0
+    for food, category, attempt, expected in reference_rankings(*reference_tables):
+        match = find_closest_alternative(app_functions.df, app_functions.footprints_df, category, food, attempt)
+        found = match.alternative if match is not None else None
+        checked += 1
+        if found != expected:
+            mismatches.append((food, category, attempt, found, expected))
+    assert checked > 0
+    assert mismatches == []
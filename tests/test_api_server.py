@@ -0,0 +1,61 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from conftest import require_cleaned_data
+
+require_cleaned_data()
+
+import api_server  # noqa: E402
+from api_server import ApiHandler, ApiServer  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = ApiServer(("127.0.0.1", 0), ApiHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+    try:
+        connection.request(method, path, body=None if body is None else json.dumps(body))
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_recipe(server):
+    status, payload = request(server, "POST", "/recipe",
+                              {"ingredients": [{"ingredient": "Corn fritter", "amount": 100, "unit": "g"}]})
+    assert status == 200
+    assert payload["missing_ingredients"] == 0
+
+
+@pytest.mark.parametrize("body", [{"ingredients": ["x"]},
+                                  {"ingredients": "x"},
+                                  {"ingredients": [{"ingredient": "Corn fritter"}]},
+                                  {"recipes": [{"ingredients": [{"ingredient": "Corn fritter", "amount": 1}]}]},
+                                  {"recipes": [{"recipe_id": 1, "ingredients": [1]}]},
+                                  {"recipes": {"recipe_id": 1}}])
+def test_malformed_recipe_is_bad_request(server, body):
+    status, payload = request(server, "POST", "/recipe", body)
+    assert status == 400
+    assert payload["error"]
+
+
+def test_unexpected_error_is_json_500(server, monkeypatch):
+    def broken(query, body):
+        raise KeyError("boom")
+
+    monkeypatch.setitem(api_server.routes, ("GET", "/broken"), broken)
+    assert request(server, "GET", "/broken") == (500, {"error": "Internal server error"})
+    # The worker thread survives and keeps answering
+    assert request(server, "GET", "/health")[0] == 200
@@ -0,0 +1,57 @@
+import time
+from email.message import EmailMessage
+
+from email_queue import EmailQueue
+
+
+class FakeConnection:
+    def __init__(self, sent):
+        self.sent = sent
+
+    def noop(self):
+        return 250, b"OK"
+
+    def send_message(self, message):
+        if message["Subject"] == "broken":
+            raise RuntimeError("unexpected")
+        self.sent.append(message["Subject"])
+
+    def quit(self):
+        pass
+
+
+class FakeQueue(EmailQueue):
+    def __init__(self, **options):
+        self.sent = []
+        super().__init__("sender@example.com", **options)
+
+    def connect(self):
+        return FakeConnection(self.sent)
+
+
+def message(subject):
+    email = EmailMessage()
+    email["Subject"] = subject
+    return email
+
+
+def test_unexpected_error_fails_only_that_job():
+    email_queue = FakeQueue()
+    broken = email_queue.submit(message("broken"))
+    fine = email_queue.submit(message("fine"))
+    email_queue.join()
+    assert email_queue.status(broken)["state"] == "failed"
+    assert "RuntimeError" in email_queue.status(broken)["error"]
+    assert email_queue.status(fine)["state"] == "sent"
+    assert email_queue.sent == ["fine"]
+    assert email_queue.worker.is_alive()
+
+
+def test_finished_statuses_expire():
+    email_queue = FakeQueue(status_ttl=0.05)
+    job_id = email_queue.submit(message("fine"))
+    email_queue.join()
+    assert email_queue.status(job_id)["state"] == "sent"
+    time.sleep(0.1)
+    assert email_queue.status(job_id)["state"] == "unknown"
+    assert email_queue.statuses == {}
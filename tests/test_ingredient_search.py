@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from conftest import require_cleaned_data
+
+require_cleaned_data()
+
+from ingredient_search import IngredientIndex, get_ingredient_index, search_ingredients  # noqa: E402
+
+foods = pd.DataFrame({"FoodID": [1, 2, 3, 4, 5, 6, 6],
+                      "FoodDescription": ["Beef, brain, raw", "Beef, ground, regular, raw", "Chicken, breast, roasted",
+                                          "Cheese, cheddar", "Bread, white", "Broccoli, raw", "Broccoli, raw"],
+                      "FoodGroupName": ["Beef Products", "Beef Products", "Poultry Products",
+                                        "Dairy and Egg Products", "Baked Products",
+                                        "Vegetables and Vegetable Products", "Vegetables and Vegetable Products"]})
+
+
+def descriptions(results):
+    return [result.description for result in results]
+
+
+def test_prefix_search_ranks_leading_word_then_length():
+    index = IngredientIndex(foods)
+    assert descriptions(index.search("beef")) == ["Beef, brain, raw", "Beef, ground, regular, raw"]
+    assert descriptions(index.search("b r")) == ["Broccoli, raw", "Beef, brain, raw", "Beef, ground, regular, raw",
+                                                 "Chicken, breast, roasted"]
+    assert descriptions(index.search("ch")) == ["Cheese, cheddar", "Chicken, breast, roasted"]
+    assert all(result.score == 1.0 for result in index.search("beef"))
+
+
+def test_words_sharing_a_prefix_count_once():
+    index = IngredientIndex(foods)
+    assert index.prefix_matches("b").tolist() == [0, 1, 2, 4, 5]
+    # "beef" and "brain" both start with b; the food is still listed once
+    assert descriptions(index.search("beef b")) == ["Beef, brain, raw", "Beef, ground, regular, raw"]
+    assert descriptions(index.search("c", limit=10)).count("Cheese, cheddar") == 1
+
+
+def test_typo_falls_back_to_trigrams():
+    index = IngredientIndex(foods)
+    results = index.search("brocoli")
+    assert descriptions(results)[0] == "Broccoli, raw"
+    assert 0 < results[0].score < 1
+    assert index.resolve("chiken breast") == 3
+
+
+def test_category_filter():
+    index = IngredientIndex(foods)
+    assert descriptions(index.search("b", category="Beef Products")) == ["Beef, brain, raw",
+                                                                         "Beef, ground, regular, raw"]
+    assert descriptions(index.search("brocoli", category="Beef Products")) == []
+    assert index.search("beef", category="Not a category") == []
+
+
+def test_no_duplicate_results_on_the_real_table():
+    index = get_ingredient_index()
+    for node_positions in (index.prefix_matches(prefix) for prefix in ("b", "c", "ch", "s")):
+        assert len(np.unique(node_positions)) == len(node_positions)
+    for query in ("ch", "chicken c", "b b", "beef b", "chese"):
+        results = search_ingredients(query, limit=20)
+        assert len({result.food_id for result in results}) == len(results)
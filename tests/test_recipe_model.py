@@ -0,0 +1,49 @@
+import pytest
+
+from conftest import require_cleaned_data
+
+require_cleaned_data()
+
+from app_functions import calculate_total_emission_individual, evaluate_recipe  # noqa: E402
+from recipe_model import Recipe  # noqa: E402
+
+
+def make_recipe():
+    recipe = Recipe()
+    butter = recipe.add("Dairy and Egg Products", "Butter, regular", 200, "g")
+    beef = recipe.add("Beef Products", "Beef, ground, regular, raw", 1, "pound")
+    second_butter = recipe.add("Dairy and Egg Products", "Butter, regular", 50, "g")
+    return recipe, butter, beef, second_butter
+
+
+def test_totals_follow_edits():
+    recipe, butter, beef, second_butter = make_recipe()
+    assert recipe.evaluate() == pytest.approx(evaluate_recipe(recipe.to_frame()))
+    recipe.remove(beef)
+    butter_emission = calculate_total_emission_individual("Butter, regular", 250, "g") / 1000
+    assert recipe.total_emission == pytest.approx(butter_emission)
+    assert recipe.rows_for("Butter, regular") == [butter, second_butter]
+
+
+def test_swap_keeps_row_order():
+    recipe, butter, beef, second_butter = make_recipe()
+    recipe.swap(butter, "Legumes and Legume Products", "Beans, hyacinth, raw", 200, "g")
+    frame = recipe.to_frame()
+    assert frame.index.tolist() == [butter, beef, second_butter]
+    assert frame["Ingredient:"].tolist() == ["Beans, hyacinth, raw", "Beef, ground, regular, raw", "Butter, regular"]
+    assert recipe.ingredients() == ["Beans, hyacinth, raw", "Beef, ground, regular, raw", "Butter, regular"]
+    recipe.swap(second_butter, "Dairy and Egg Products", "Butter, regular", 60, "g")
+    recipe.swap(beef, "Dairy and Egg Products", "Butter, regular", 100, "g")
+    assert recipe.rows_for("Butter, regular") == [beef, second_butter]
+    assert recipe.ingredients() == ["Beans, hyacinth, raw", "Butter, regular"]
+    assert recipe.evaluate() == pytest.approx(evaluate_recipe(recipe.to_frame()))
+
+
+def test_clear_resets_without_reusing_ids():
+    recipe, butter, beef, second_butter = make_recipe()
+    recipe.clear()
+    assert len(recipe) == 0
+    assert recipe.total_emission == 0.0
+    assert recipe.ingredients() == []
+    assert recipe.to_frame().empty
+    assert recipe.add("Beef Products", "Beef, ground, regular, raw", 100, "g") > second_butter
@@ -0,0 +1,62 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from conftest import require_cleaned_data
+
+require_cleaned_data()
+
+from app_functions import AlternativeMatch, calculate_total_emission_individual  # noqa: E402
+from recipe_optimizer import optimize_recipe, solve_swaps  # noqa: E402
+
+
+def brute_force(options, distance_budget):
+    # Best total saving over every combination of at most one option per row
+    best = 0.0
+    for picked in itertools.product(*[[-1] + list(range(len(row_options))) for row_options in options]):
+        chosen = [row_options[choice] for row_options, choice in zip(options, picked) if choice >= 0]
+        if sum(distance for distance, _ in chosen) <= distance_budget:
+            best = max(best, sum(saving for _, saving in chosen))
+    return best
+
+
+def plan_totals(options, picked):
+    chosen = [row_options[choice] for row_options, choice in zip(options, picked) if choice >= 0]
+    return sum(distance for distance, _ in chosen), sum(saving for _, saving in chosen)
+
+
+def test_zero_budget_allows_only_free_swaps():
+    assert solve_swaps([[(500.0, 3.0)], [(10.0, 1.0)]], 0) == [-1, -1]
+    assert solve_swaps([[(500.0, 3.0)], [(1e-12, 1.0)]], 0.0) == [-1, -1]
+    assert solve_swaps([[(500.0, 3.0), (0.0, 0.5)], [(10.0, 1.0)]], 0) == [1, -1]
+    assert solve_swaps([[(500.0, 3.0)]], -1.0) == [-1]
+
+
+@pytest.mark.parametrize("distance_budget", [0.5, 10.0, 25.0, 60.0, 1000.0])
+def test_plans_stay_within_budget_and_find_the_best_saving(distance_budget):
+    options = [[(5.0, 1.0), (20.0, 4.0)],
+               [(12.5, 2.5), (40.0, 6.0), (1e-12, 0.1)],
+               [(25.0, 5.0)],
+               [],
+               [(7.5, 0.0), (7.5, 1.5)]]
+    picked = solve_swaps(options, distance_budget)
+    distance, saving = plan_totals(options, picked)
+    assert distance <= distance_budget
+    assert saving == pytest.approx(brute_force(options, distance_budget))
+
+
+def test_zero_budget_recipe_has_no_swaps():
+    ingredient = "Corn fritter"
+    recipe = pd.DataFrame({"Category:": ["Baked Products"], "Ingredient:": [ingredient], "Amount:": [100.0],
+                           "Unit:": ["g"],
+                           "CO2 Emission (Kg):": [calculate_total_emission_individual(ingredient, 100.0, "g") / 1000]})
+    original_emission = float(recipe["CO2 Emission (Kg):"].iloc[0])
+    options = [AlternativeMatch(ingredient, "Cheaper food", "Baked Products", 0, 57.27, 0.0, 1.0)]
+    plan = optimize_recipe(recipe, 0.0, candidates=lambda food: options)
+    assert plan.swaps == ()
+    assert plan.distance_used == 0.0
+    plan = optimize_recipe(recipe, 100.0, candidates=lambda food: options)
+    assert len(plan.swaps) == 1
+    assert plan.distance_used <= plan.distance_budget
+    assert plan.optimized_emission == pytest.approx(original_emission - plan.swaps[0].co2_saving_kg)
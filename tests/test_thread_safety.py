@@ -0,0 +1,68 @@
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from conftest import require_cleaned_data
+
+require_cleaned_data()
+
+import app_functions  # noqa: E402
+from app_functions import df, nutrient_df, footprints_df, nutrient_matrices, calculate_total_emission_individual, \
+    find_alternative_ranking, find_closest_alternative, find_eligible_category  # noqa: E402
+
+
+def make_tasks(count=400, seed=3):
+    rng = random.Random(seed)
+    foods = nutrient_df["FoodDescription"].astype(str).tolist()
+    categories = list(app_functions.map_category)
+    tasks = []
+    for _ in range(count):
+        food = rng.choice(foods)
+        category = rng.choice(categories)
+        kind = rng.randrange(4)
+        if kind == 0:
+            tasks.append((find_closest_alternative, (df, footprints_df, category, food, rng.choice([0, 1, 5]))))
+        elif kind == 1:
+            tasks.append((find_alternative_ranking, (df, category, food, rng.choice([1, 5, 20]))))
+        elif kind == 2:
+            tasks.append((calculate_total_emission_individual, (food, rng.choice([1, 100, 250]), "g")))
+        else:
+            tasks.append((find_eligible_category, (df, footprints_df, food)))
+    return tasks
+
+
+def run_task(task):
+    function, arguments = task
+    return function(*arguments)
+
+
+def snapshot_matrices():
+    return {category: tuple(np.array(values, copy=True) for values in entry)
+            for category, entry in nutrient_matrices.items()}
+
+
+def test_concurrent_searches_match_serial_run():
+    tasks = make_tasks()
+    df_before = df.copy(deep=True)
+    nutrient_df_before = nutrient_df.copy(deep=True)
+    matrices_before = snapshot_matrices()
+
+    serial = [run_task(task) for task in tasks]
+    switch_interval = sys.getswitchinterval()
+    # Switch threads far more often than usual so the calls interleave mid-search
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(16) as executor:
+            concurrent = list(executor.map(run_task, tasks * 3))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert concurrent == serial * 3
+    assert df.equals(df_before)
+    assert nutrient_df.equals(nutrient_df_before)
+    assert list(nutrient_matrices) == list(matrices_before)
+    for category, entry in nutrient_matrices.items():
+        for values, values_before in zip(entry, matrices_before[category]):
+            np.testing.assert_array_equal(values, values_before)